@@ -1,112 +1,154 @@
-from flask import Flask, render_template, request, url_for
-import pandas as pd
-import re, math, os
-
-app = Flask(__name__, static_folder='static', template_folder='templates')
-
-# path to excel (automatically loaded)
-EXCEL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'catalog.xlsx')
-
-def parse_gender(name):
-    name_l = name.lower()
-    if any(x in name_l for x in ('women', 'woman', 'wmn', 'wmns', 'lady', 'girl')):
-        return 'women'
-    if any(x in name_l for x in ('men', 'man', 'mns', 'male', 'boy')):
-        return 'men'
-    return 'unisex'
-
-def parse_size(name):
-    # try to find a size at the end or near the end: look for numbers like 8, 8.5, 42, 42.5
-    m = re.search(r'(\d{1,2}(?:[\.,]\d)?)\s*$', name)
-    if m:
-        return m.group(1).replace(',', '.')
-    # fallback: search any size-like token
-    m2 = re.search(r'(\d{1,2}(?:[\.,]\d)?)', name)
-    if m2:
-        return m2.group(1).replace(',', '.')
-    return ''
-
-def load_products():
-    df = pd.read_excel(EXCEL_PATH, header=None)
-    # Убедимся, что есть хотя бы 3 колонки
-    for i in range(3 - df.shape[1]):
-        df[i] = ''
-    df = df[[0, 1, 2]]
-    df.columns = ['name', 'brand', 'price_raw']
-    products = []
-
-    for _, row in df.iterrows():
-        name = str(row['name']).strip()
-        brand = str(row['brand']).strip() if not pd.isna(row['brand']) else ''
-        price_raw = row['price_raw']
-
-        try:
-            price = float(price_raw)
-        except Exception:
-            import re
-            s = re.sub(r'[^0-9.,]', '', str(price_raw))
-            s = s.replace(',', '.')
-            try:
-                price = float(s) if s else float('nan')
-            except:
-                price = float('nan')
-
-        # Если цена не число — ставим 0
-        if pd.isna(price):
-            price_val = 0.0
-        else:
-            price_val = float(price)
-
-        size = parse_size(name)
-        gender = parse_gender(name)
-
-        # Безопасный расчёт цены со скидкой
-        if price_val and price_val > 0:
-            display_price = int(math.ceil(price_val * 0.85))
-        else:
-            display_price = 0
-
-        products.append({
-            'name': name or 'Без названия',
-            'brand': brand or 'Unknown',
-            'price': int(price_val) if price_val else 0,
-            'display_price': display_price,
-            'size': size,
-            'gender': gender,
-            'image': '/static/images/placeholder.svg'
-        })
-
-    return products
+from flask import Flask, Response, abort, g, render_template, request, url_for
+import os
+import time
+from components import metrics
+from components.catalog_query import FilterSpec
+from components.catalog_watcher import CatalogWatcher
+from components.image_index import get_image_index
+from components.image_variants import get_variant_index
+
+# Производные изображения (static/derived) названы по хэшу содержимого и не меняются
+DERIVED_IMAGES_MAX_AGE = 365 * 24 * 3600
+
+class StoreFlask(Flask):
+    def get_send_file_max_age(self, filename):
+        if filename and filename.replace('\\', '/').startswith('derived/'):
+            return DERIVED_IMAGES_MAX_AGE
+        return super().get_send_file_max_age(filename)
+
+app = StoreFlask(__name__, static_folder='static', template_folder='templates')
+
+# path to excel (automatically loaded); CATALOG_PATH подменяет его (бенчмарк)
+EXCEL_PATH = os.environ.get("CATALOG_PATH") or os.path.join(os.path.dirname(__file__), 'data', 'catalog.xlsx')
+
+# Каталог на весь процесс: фоновый поток пересобирает его при изменении xlsx
+# и подменяет целиком, запросы никогда не ждут перезагрузки
+catalog = CatalogWatcher(EXCEL_PATH).start()
+# JSON ответы /api/... готовим при старте; новые версии каталога наследуют это от прошлой
+catalog.current.api
+
+# --- Метрики (/metrics, текстовый формат Prometheus) ---
+# Фильтры запроса в метке - только какие заданы, не их значения: серий не больше 16 на маршрут
+FILTER_ARGS = ('brand', 'gender', 'size', 'color')
+
+REQUEST_LATENCY = metrics.histogram(
+    "dene_http_request_duration_seconds", "Время ответа по маршруту и набору фильтров", ["route", "filters"]
+)
+
+def filter_combination(args):
+    return "+".join(name for name in FILTER_ARGS if args.get(name, '').strip()) or "none"
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route, filter_combination(request.args))
+    return response
+
+def _catalog_counts():
+    engine = catalog.current.query_engine
+    return {
+        ('rows',): len(catalog.current),
+        ('products',): len(engine),
+        ('brands',): len(engine.options['brand']),
+        ('models',): len(engine.options['model']),
+    }
+
+metrics.callback("dene_catalog_items", "Размер текущей версии каталога", _catalog_counts, labelnames=["kind"])
+metrics.callback("dene_catalog_reloads_total", "Перезагрузки каталога", lambda: catalog.reloads, "counter")
+metrics.callback("dene_catalog_reload_failures_total", "Неудачные перезагрузки каталога",
+                 lambda: catalog.reload_failures, "counter")
+metrics.callback("dene_catalog_reload_seconds_total", "Суммарное время перезагрузок каталога",
+                 lambda: catalog.reload_seconds_total, "counter")
+metrics.callback("dene_catalog_last_reload_seconds", "Время последней сборки каталога",
+                 lambda: catalog.last_reload_seconds)
+metrics.callback("dene_catalog_source_mtime_seconds", "mtime xlsx текущей версии каталога",
+                 lambda: catalog.current.version[0] / 1e9)
+metrics.callback("dene_image_index_files", "Файлов в индексе фото", lambda: len(get_image_index()))
+metrics.callback("dene_image_variant_sources", "Фото с собранными вариантами",
+                 lambda: len(get_variant_index()))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.expose(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/')
 def index():
-    products = load_products()
-    # build filter options
-    brands = sorted({p['brand'] for p in products if p['brand']})
-    sizes = sorted({p['size'] for p in products if p['size']}, key=lambda x: float(x) if x and x.replace('.', '', 1).isdigit() else 999)
-    genders = sorted({p['gender'] for p in products if p['gender']})
+    engine = catalog.current.query_engine
 
     # get filters from query
     brand = request.args.get('brand', '').strip()
     gender = request.args.get('gender', '').strip()
     size = request.args.get('size', '').strip()
+    color = request.args.get('color', '').strip()
 
-    filtered = products
-    if brand:
-        filtered = [p for p in filtered if p['brand'].lower() == brand.lower()]
-    if gender:
-        filtered = [p for p in filtered if p['gender'].lower() == gender.lower()]
-    if size:
-        filtered = [p for p in filtered if p['size'] == size]
+    # Та же логика фильтров, что и в Streamlit (пол - из колонки gender, unisex подходит всем)
+    result = engine.query(FilterSpec(brand=brand, gender=gender, size=size, color=color))
+    facets = {
+        'brands': engine.options['brand'],
+        'sizes': engine.options['size'],
+        'genders': engine.options['gender'],
+        'colors': engine.options['color'],
+    }
 
     return render_template('index.html',
-                           products=filtered,
-                           brands=brands,
-                           sizes=sizes,
-                           genders=genders,
+                           products=result.products,
+                           facet_counts=result.facet_counts,
+                           filters=facets,
+                           brands=facets['brands'],
+                           sizes=facets['sizes'],
+                           genders=facets['genders'],
                            selected_brand=brand,
                            selected_gender=gender,
-                           selected_size=size)
+                           selected_size=size,
+                           selected_color=color)
+
+# --- JSON API (ответы готовятся один раз на версию каталога) ---
+API_FILTER_ARGS = ('brand', 'model', 'size', 'gender', 'color', 'search', 'page', 'page_size')
+
+def api_filters():
+    spec = {name: request.args.get(name, '').strip() for name in API_FILTER_ARGS}
+    for name in ('page', 'page_size'):
+        spec[name] = int(spec[name]) if spec[name].isdigit() else None
+    return FilterSpec(**spec)
+
+def api_response(payload):
+    """Готовый ответ с сильным ETag; If-None-Match → 304, gzip - если клиент его принимает"""
+    use_gzip = payload.gzip is not None and request.accept_encodings['gzip'] > 0
+    # У сжатого и несжатого представления разные ETag
+    etag = payload.etag + ("-gz" if use_gzip else "")
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(payload.gzip if use_gzip else payload.body, mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers.update(payload.headers)
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Клиенты и CDN хранят ответ, но каждый раз сверяют ETag
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+@app.route('/api/products')
+def api_products():
+    return api_response(catalog.current.api.products(api_filters()))
+
+@app.route('/api/products/<product_id>')
+def api_product(product_id):
+    payload = catalog.current.api.product(product_id)
+    if payload is None:
+        abort(404)
+    return api_response(payload)
+
+@app.route('/api/facets')
+def api_facets():
+    return api_response(catalog.current.api.facets(api_filters()))
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,346 @@
+# Бенчмарк горячих путей каталога на синтетических данных.
+#
+# Генерирует xlsx на 1k/10k/100k строк (тот же формат листов, что data/catalog.xlsx)
+# и дерево фото <Бренд>/<Товар>/ как в data/images, замеряет загрузку каталога,
+# фильтры, поиск и рендер фото и пишет результаты в JSON. Работает без сети:
+#
+#   python benchmark.py                      # 1k и 10k строк
+#   python benchmark.py --scales 1000,10000,100000 --output bench_results.json
+#   python benchmark.py --compare bench_baseline.json   # код выхода 1 при регрессии
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+from openpyxl import Workbook
+from PIL import Image
+
+# --- Константы ---
+DEFAULT_SCALES = (1000, 10000)
+DEFAULT_OUTPUT = "bench_results.json"
+# Сколько раз повторять быстрые стадии (берется медиана)
+DEFAULT_REPEATS = 5
+# Фото генерируются не для всех товаров: на 100k строк это заняло бы минуты.
+# Товары сверх лимита ссылаются на отсутствующие файлы (путь no_image.jpg)
+DEFAULT_MAX_IMAGES = 1500
+IMAGE_SIZE = (800, 800)
+# Во сколько раз стадия может стать медленнее базовой, прежде чем это регрессия
+DEFAULT_THRESHOLD = 1.25
+
+BRANDS = ["Nike", "Adidas", "Asics", "Hoka", "Mizuno", "Puma", "New Balance", "Salomon", "Saucony", "On"]
+COLORS = ["white", "black", "grey", "blue", "red", "green", "beige", "brown", "pink", "orange"]
+GENDERS = ["men", "women", "unisex"]
+US_SIZES = ["5", "5.5", "6", "6.5", "7", "7.5", "8", "8.5", "9", "9.5", "10", "10.5", "11", "12"]
+COLUMNS = ['sku', 'brand', 'model', 'gender', 'color', 'image', 'size US', 'size EU',
+           'price', 'preorder', 'in stock', 'description']
+IMAGES_PER_PRODUCT = 2
+
+
+# --- Синтетические данные ---
+def generate_workbook(path, rows, seed=0):
+    """xlsx с листом на бренд: первая строка товара заполнена, остальные - только размеры.
+
+    Возвращает список товаров [(бренд, папка товара, sku)] для генерации фото.
+    """
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    sheets = {brand: wb.create_sheet(brand) for brand in BRANDS}
+    for sheet in sheets.values():
+        sheet.append(COLUMNS)
+
+    products = []
+    sku = 100000
+    written = 0
+    while written < rows:
+        brand = BRANDS[len(products) % len(BRANDS)]
+        model = f"Model {len(products) // len(BRANDS)} ({rng.randint(1000, 9999)}-{rng.randint(100, 999)})"
+        color = rng.choice(COLORS)
+        sku += 1
+        image = " ".join(f"{sku}_{n}" for n in range(1, IMAGES_PER_PRODUCT + 1))
+        price = rng.randint(20, 200) * 1000
+        sizes = rng.sample(US_SIZES, rng.randint(4, 10))
+        for i, size in enumerate(sorted(sizes, key=float)):
+            if written >= rows:
+                break
+            first = i == 0
+            sheets[brand].append([
+                sku * 100 + i,
+                brand if first else None,
+                model if first else None,
+                rng.choice(GENDERS) if first else None,
+                color if first else None,
+                image if first else None,
+                float(size),
+                float(size) + 33,
+                price + rng.choice([0, 0, 5000]),
+                None,
+                "yes" if rng.random() < 0.8 else "no",
+                f"Описание {sku}" if first else None,
+            ])
+            written += 1
+        products.append((brand, f"{brand} {model} {color}", sku))
+    wb.save(path)
+    return products
+
+
+def generate_images(images_dir, products, max_images, seed=0):
+    """Дерево <Бренд>/<Товар>/<sku>_<n>.jpg (как data/images) для первых товаров"""
+    rng = random.Random(seed)
+    count = 0
+    for brand, product_dir, sku in products:
+        if count >= max_images:
+            break
+        folder = os.path.join(images_dir, brand, product_dir)
+        os.makedirs(folder, exist_ok=True)
+        for n in range(1, IMAGES_PER_PRODUCT + 1):
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            img = Image.new("RGB", IMAGE_SIZE, color)
+            # Немного деталей, чтобы JPEG не сжимался до нуля
+            img.paste(Image.effect_noise((IMAGE_SIZE[0] // 4, IMAGE_SIZE[1] // 4), 64).convert("RGB"), (100, 100))
+            img.save(os.path.join(folder, f"{sku}_{n}.jpg"), quality=85)
+            count += 1
+    # Заглушка, как в data/images
+    Image.new("RGB", (400, 400), (240, 240, 240)).save(os.path.join(images_dir, "no_image.jpg"))
+    return count
+
+
+# --- Замеры ---
+class Timings:
+    """Результаты стадий: время каждого повтора в секундах"""
+
+    def __init__(self, repeats):
+        self.repeats = repeats
+        self.stages = {}
+
+    def measure(self, name, func, repeats=None, setup=None):
+        """Замеряет func (setup перед каждым повтором не считается), возвращает последний результат"""
+        times = []
+        result = None
+        for _ in range(repeats or self.repeats):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+        self.stages[name] = {
+            'median': statistics.median(times),
+            'min': min(times),
+            'max': max(times),
+            'repeats': len(times),
+        }
+        print(f"  {name:<32} {statistics.median(times) * 1000:10.2f} ms")
+        return result
+
+
+def bench_scale(rows, workdir, repeats, max_images):
+    from components import catalog as catalog_module
+    from components.catalog import build_catalog, compile_catalog, sheet_fingerprints
+    from components.catalog_query import CatalogQueryEngine, FilterSpec
+    from components.image_cache import ThumbnailCache, render_thumbnail
+    from components.image_index import ImageIndex, get_image_path
+    from components.variants import build_variant_tree
+
+    scale_dir = os.path.join(workdir, f"rows_{rows}")
+    images_dir = os.path.join(scale_dir, "images")
+    catalog_path = os.path.join(scale_dir, "catalog.xlsx")
+    snapshot_path = os.path.join(scale_dir, "catalog.arrow")
+    os.makedirs(images_dir, exist_ok=True)
+
+    timings = Timings(repeats)
+    print(f"\n{rows} строк")
+    products = timings.measure("generate_workbook", lambda: generate_workbook(catalog_path, rows), repeats=1)
+    images = timings.measure("generate_images", lambda: generate_images(images_dir, products, max_images), repeats=1)
+
+    # --- Загрузка каталога ---
+    def remove_snapshot():
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+    heavy = 1 if rows > 10000 else min(repeats, 3)
+    timings.measure("read_xlsx_full", lambda: build_catalog(catalog_path), repeats=heavy)
+    timings.measure("sheet_fingerprints", lambda: sheet_fingerprints(catalog_path), repeats=heavy)
+    timings.measure("compile_catalog_cold", lambda: compile_catalog(catalog_path, snapshot_path),
+                    repeats=heavy, setup=remove_snapshot)
+    df = timings.measure("compile_catalog_snapshot", lambda: compile_catalog(catalog_path, snapshot_path))
+    timings.measure("load_catalog_arrow", lambda: catalog_module.read_snapshot(snapshot_path))
+
+    # --- Индексы и фильтры ---
+    engine = timings.measure("query_engine_build", lambda: CatalogQueryEngine.from_catalog(df, version=1), repeats=heavy)
+    timings.measure("variant_tree_build", lambda: build_variant_tree(df), repeats=heavy)
+
+    rng = random.Random(1)
+    specs = [FilterSpec()] + [
+        FilterSpec(
+            brand=rng.choice(engine.options['brand'] + [None]),
+            size=rng.choice(engine.options['size'] + [None]),
+            gender=rng.choice(engine.options['gender'] + [None]),
+            color=rng.choice(engine.options['color'] + [None]),
+            page_size=12,
+        )
+        for _ in range(50)
+    ]
+    # Без кэша запросов: полный проход фильтра и счетчиков фасетов
+    timings.measure("filter_50_specs_uncached",
+                    lambda: [engine._run(engine.normalize(spec)) for spec in specs])
+    timings.measure("filter_50_specs_cached", lambda: [engine.query(spec) for spec in specs])
+
+    # --- Фото ---
+    image_names = df['image'].dropna().unique().tolist()
+    timings.measure("image_index_scan", lambda: len(ImageIndex(images_dir)), repeats=heavy)
+    timings.measure("get_image_path_all", lambda: [get_image_path(names, images_dir) for names in image_names])
+
+    sample = []
+    for names in image_names:
+        path = get_image_path(names, images_dir)
+        if not path.endswith("no_image.jpg"):
+            sample.append(path)
+        if len(sample) >= 24:
+            break
+    if sample:
+        timings.measure("render_thumbnail_24", lambda: [render_thumbnail(path) for path in sample], repeats=heavy)
+        cache_dir = os.path.join(scale_dir, "thumbnails")
+        cache = ThumbnailCache(cache_dir=cache_dir)
+        timings.measure("thumbnail_cache_cold_24", lambda: [cache.get_base64(path) for path in sample],
+                        repeats=1, setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+        timings.measure("thumbnail_cache_disk_24",
+                        lambda: [ThumbnailCache(cache_dir=cache_dir).get_base64(path) for path in sample])
+        timings.measure("thumbnail_cache_memory_24", lambda: [cache.get_base64(path) for path in sample])
+
+    # --- Flask: страница каталога ---
+    bench_flask(catalog_path, timings)
+
+    return {
+        'rows': rows,
+        'products': len(products),
+        'images': images,
+        'catalog_rows': len(df),
+        'stages': timings.stages,
+    }
+
+
+def bench_flask(catalog_path, timings):
+    """GET / и /api/products через тестовый клиент Flask на синтетическом каталоге"""
+    # app запускает наблюдатель каталога при импорте: сразу направляем его на синтетический xlsx
+    os.environ["CATALOG_PATH"] = catalog_path
+    import app as flask_app
+    from components.catalog_watcher import CatalogWatcher
+
+    if flask_app.catalog.catalog_path != catalog_path:
+        # Модуль уже импортирован на прошлом масштабе
+        flask_app.catalog.stop()
+        flask_app.catalog = CatalogWatcher(catalog_path).start()
+    watcher = flask_app.catalog
+    try:
+        client = flask_app.app.test_client()
+        options = watcher.current.query_engine.options
+        brand, gender, size, color = (options[name][0] for name in ('brand', 'gender', 'size', 'color'))
+        timings.measure("flask_index_all", lambda: client.get("/").status_code)
+        timings.measure("flask_index_brand", lambda: client.get(f"/?brand={brand}").status_code)
+
+        # Наборы фильтров - как метка filters у метрик задержки
+        combinations = {
+            "none": "",
+            "brand": f"brand={brand}",
+            "brand+size": f"brand={brand}&size={size}",
+            "gender+color": f"gender={gender}&color={color}",
+            "brand+gender+size+color": f"brand={brand}&gender={gender}&size={size}&color={color}",
+        }
+
+        def get_all():
+            return [client.get(f"/api/products?{query}").status_code for query in combinations.values()]
+
+        api = watcher.current.api
+        # Первый запрос фильтра: выборка и сериализация; дальше - готовые байты
+        timings.measure("flask_api_products_uncached", get_all, setup=api._memo.clear)
+        for name, query in combinations.items():
+            timings.measure(f"flask_api_products_{name}",
+                            lambda query=query: client.get(f"/api/products?{query}").status_code)
+    finally:
+        watcher.stop()
+        os.environ.pop("CATALOG_PATH", None)
+
+
+# --- Результаты ---
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Стадии, которые стали медленнее базовых больше чем в threshold раз"""
+    regressions = []
+    base_scales = {scale['rows']: scale for scale in baseline.get('scales', [])}
+    for scale in results['scales']:
+        base = base_scales.get(scale['rows'])
+        if base is None:
+            continue
+        for name, stage in scale['stages'].items():
+            if name.startswith("generate_") or name not in base['stages']:
+                continue
+            before = base['stages'][name]['median']
+            # Микросекундные стадии сравнивать бессмысленно - шум больше разницы
+            if before > 0.001 and stage['median'] > before * threshold:
+                regressions.append((scale['rows'], name, before, stage['median']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки каталога, фильтров и фото")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="размеры каталога в строках через запятую")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--max-images", type=int, default=DEFAULT_MAX_IMAGES)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="файл с результатами (JSON)")
+    parser.add_argument("--workdir", help="папка для синтетических данных (по умолчанию временная)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    # Стадии читают пути проекта (templates, components) относительно корня
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="dene-bench-")
+    results = {'environment': environment(), 'scales': []}
+    try:
+        for rows in (int(value) for value in args.scales.split(",") if value.strip()):
+            results['scales'].append(bench_scale(rows, workdir, args.repeats, args.max_images))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for rows, name, before, after in regressions:
+            print(f"⚠️ {rows} строк, {name}: {before * 1000:.2f} → {after * 1000:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print("✅ Регрессий нет")
+
+
+if __name__ == "__main__":
+    main()
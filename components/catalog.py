@@ -0,0 +1,421 @@
+import os
+import re
+import json
+import hashlib
+import numbers
+import posixpath
+import zipfile
+from collections import namedtuple
+from xml.etree import ElementTree
+from xml.sax.saxutils import unescape
+
+import pandas as pd
+
+from components.sizes import eu_size_column
+
+try:
+    import pyarrow as pa
+except ImportError:  # без pyarrow читаем Excel напрямую
+    pa = None
+
+# --- Пути и константы ---
+CATALOG_PATH = "data/catalog.xlsx"
+# Меняем при любом изменении нормализации, чтобы старые снимки пересобрались
+SNAPSHOT_FORMAT_VERSION = 4
+SNAPSHOT_METADATA_KEY = b"jmd_catalog"
+
+
+def snapshot_path_for(catalog_path):
+    """Путь к скомпилированному снимку рядом с xlsx: data/catalog.arrow"""
+    return os.path.splitext(catalog_path)[0] + ".arrow"
+
+
+# --- Нормализация листа (то же, что делал load_data() в main.py) ---
+def normalize_sheet(sheet_data, sheet_name=None):
+    """Заполняет пропуски вниз, чистит размеры и название модели"""
+    sheet_data = sheet_data.fillna("")
+    sheet_data['brand'] = sheet_data['brand'].replace('', pd.NA).ffill()
+    sheet_data['model'] = sheet_data['model'].replace('', pd.NA).ffill()
+    sheet_data['gender'] = sheet_data['gender'].replace('', pd.NA).ffill()
+    sheet_data['color'] = sheet_data['color'].replace('', pd.NA).ffill()
+    # Изображения оставляем как есть - не заполняем!
+    sheet_data['image'] = sheet_data['image'].replace('', pd.NA)
+    sheet_data['size US'] = sheet_data['size US'].astype(str).str.strip()
+    # Обрабатываем EU размеры, если колонка есть
+    if 'size EU' in sheet_data.columns:
+        sheet_data['size EU'] = sheet_data['size EU'].astype(str).str.strip()
+
+    # Очищаем название модели (убираем артикулы в скобках)
+    sheet_data["model_clean"] = sheet_data["model"].apply(
+        lambda x: re.sub(r'\([^)]*\)', '', str(x)).strip() if pd.notna(x) else ""
+    )
+    if sheet_name is not None:
+        sheet_data['sheet'] = sheet_name
+    return sheet_data
+
+
+# --- Маска строк в наличии ---
+def available_rows_mask(df):
+    """Маска строк с указанным US размером и отметкой 'in stock' = yes"""
+    us_sizes = df['size US'].astype(str).str.strip()
+    has_size = (us_sizes != "") & (us_sizes != "nan")
+    if 'in stock' in df.columns:
+        in_stock = df['in stock'].astype(str).str.strip().str.lower() == 'yes'
+    else:
+        in_stock = pd.Series(True, index=df.index)
+    return has_size & in_stock
+
+
+def group_keys(df, columns):
+    """Ключ группы для каждой строки (кортеж значений columns)"""
+    return pd.Series(list(zip(*(df[column] for column in columns))), index=df.index, dtype=object)
+
+
+# --- Ключ товара ---
+def product_id(brand, model_clean, color):
+    """Стабильный ключ товара (бренд, модель, цвет): не зависит от порядка строк и листов"""
+    key = "|".join(str(part).strip() for part in (brand, model_clean, color))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def product_id_column(df):
+    """product_id каждой строки; хэш считается один раз на товар"""
+    ids = {}
+    values = []
+    for key in zip(df['brand'], df['model_clean'], df['color']):
+        value = ids.get(key)
+        if value is None:
+            value = ids[key] = product_id(*key)
+        values.append(value)
+    return pd.Series(values, index=df.index, dtype=object)
+
+
+def finalize_catalog(processed_dfs):
+    """Объединяет листы, убирает строки без бренда/модели, добавляет size_eu и product_id"""
+    df = pd.concat(processed_dfs, ignore_index=True)
+    df = df[(df['brand'] != '') & (df['model_clean'] != '')].reset_index(drop=True)
+    # Нормализованный EU размер и ключ товара считаются один раз при компиляции
+    return df.assign(size_eu=eu_size_column(df), product_id=product_id_column(df))
+
+
+def read_sheets(catalog_path=CATALOG_PATH, sheet_names=None):
+    """Нормализованные листы xlsx (все или только sheet_names) через openpyxl - медленный путь"""
+    sheets = pd.read_excel(catalog_path, sheet_name=None if sheet_names is None else list(sheet_names))
+    return {sheet_name: normalize_sheet(sheet_data, sheet_name) for sheet_name, sheet_data in sheets.items()}
+
+
+def build_catalog(catalog_path=CATALOG_PATH):
+    """Читает и нормализует все листы xlsx"""
+    return finalize_catalog(list(read_sheets(catalog_path).values()))
+
+
+# --- Отпечатки листов (без openpyxl, прямо из zip) ---
+_NS = {
+    'main': "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    'rel': "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_SHEET_DATA = re.compile(rb'<sheetData\b[^>]*?(?:/>|>.*?</sheetData>)', re.S)
+_CELL = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_CELL_ATTRIBUTE = re.compile(rb'\b(r|t)="([^"]*)"')
+_VALUE = re.compile(rb'<v>(.*?)</v>', re.S)
+_INLINE_TEXT = re.compile(rb'<t\b[^>]*>(.*?)</t>', re.S)
+_XML_ENTITIES = {'&quot;': '"', '&apos;': "'"}
+
+
+def _shared_strings(archive):
+    try:
+        root = ElementTree.fromstring(archive.read("xl/sharedStrings.xml"))
+    except KeyError:
+        return []
+    return [
+        "".join(text.text or "" for text in item.iter(f"{{{_NS['main']}}}t")).encode("utf-8")
+        for item in root.findall('main:si', _NS)
+    ]
+
+
+def _sheet_parts(archive):
+    """Имена листов в порядке книги → путь к xml листа в архиве"""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.findall('rel:Relationship', _NS)}
+    parts = {}
+    for sheet in workbook.iterfind('main:sheets/main:sheet', _NS):
+        target = targets[sheet.get(_R_ID)]
+        parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+    return parts
+
+
+def sheet_fingerprints(catalog_path=CATALOG_PATH):
+    """sha256 данных каждого листа: адрес, тип и значение ячеек.
+
+    Отпечаток меняется только у листов с измененными ячейками, поэтому
+    правка одного листа не пересобирает остальные. Пересохранение книги
+    в Excel/openpyxl переписывает xml всех листов и может привести
+    к полной пересборке.
+    """
+    with zipfile.ZipFile(catalog_path) as archive:
+        strings = _shared_strings(archive)
+        fingerprints = {}
+        for sheet_name, part in _sheet_parts(archive).items():
+            digest = hashlib.sha256()
+            sheet_data = _SHEET_DATA.search(archive.read(part))
+            for attributes, content in _CELL.findall(sheet_data.group(0) if sheet_data else b""):
+                if not content:
+                    continue
+                attributes = dict(_CELL_ATTRIBUTE.findall(attributes))
+                # t="n" (число) - тип по умолчанию, openpyxl пишет его явно
+                cell_type = attributes.get(b't', b'n')
+                if cell_type == b'inlineStr':
+                    # Так строки пишет openpyxl - отпечаток тот же, что у sharedStrings
+                    text = b"".join(_INLINE_TEXT.findall(content)).decode("utf-8")
+                    cell_type, value = b'str', unescape(text, _XML_ENTITIES).encode("utf-8")
+                else:
+                    # Только значение (pandas читает кэш формул), без текста формулы
+                    match = _VALUE.search(content)
+                    value = match.group(1) if match else b""
+                    if cell_type == b's' and value.isdigit() and int(value) < len(strings):
+                        # Индекс в sharedStrings заменяем самой строкой
+                        cell_type, value = b'str', strings[int(value)]
+                digest.update(attributes.get(b'r', b'') + b'\0' + cell_type + b'\0' + value + b'\1')
+            fingerprints[sheet_name] = digest.hexdigest()
+    return fingerprints
+
+
+def _sheet_columns(sheet_data):
+    return [column for column in sheet_data.columns if column not in ('model_clean', 'sheet')]
+
+
+def splice_catalog(previous, catalog_path, fingerprints, previous_sheets):
+    """Собирает каталог из неизмененных листов прошлого снимка и перечитанных листов.
+
+    Возвращает DataFrame, описание листов для метаданных и список
+    измененных (в том числе удаленных) листов.
+    """
+    changed = [
+        sheet_name for sheet_name, fingerprint in fingerprints.items()
+        if previous_sheets.get(sheet_name, {}).get('fingerprint') != fingerprint
+    ]
+    fresh = read_sheets(catalog_path, changed) if changed else {}
+    frames, sheets = [], {}
+    for sheet_name, fingerprint in fingerprints.items():
+        if sheet_name in fresh:
+            sheet_data = fresh[sheet_name]
+            columns = _sheet_columns(sheet_data)
+        else:
+            # Только исходные колонки листа: порядок колонок как при полной сборке
+            columns = previous_sheets[sheet_name]['columns']
+            sheet_data = previous.loc[previous['sheet'] == sheet_name, columns + ['model_clean', 'sheet']]
+        frames.append(sheet_data)
+        sheets[sheet_name] = {'fingerprint': fingerprint, 'columns': columns}
+    removed = [sheet_name for sheet_name in previous_sheets if sheet_name not in fingerprints]
+    return finalize_catalog(frames), sheets, changed + removed
+
+
+# --- Отпечаток исходного файла ---
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_stamp(catalog_path):
+    stat = os.stat(catalog_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+# --- Кодирование смешанных колонок для Arrow ---
+# Вид значения в смешанной колонке: сами значения хранятся строками
+KIND_TEXT, KIND_INT, KIND_FLOAT = 0, 1, 2
+
+def _is_blank(value):
+    return isinstance(value, str) and value == ""
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+def _value_kind(value):
+    if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        return KIND_INT
+    return KIND_FLOAT if _is_number(value) else KIND_TEXT
+
+def _to_arrow_frame(df):
+    """После fillna("") колонки смешивают числа и "": числа храним числами, "" - как null.
+
+    В колонках, где числа идут вперемешку с текстом или целые с дробными
+    (артикул 100001 рядом с "AB-7"), значения пишутся строками, а их вид -
+    в отдельную колонку, чтобы при чтении вернуть те же типы.
+    """
+    df = df.copy()
+    columns = {'blank_numeric': [], 'integer': [], 'pd_na': [], 'mixed': {}}
+    for position, column in enumerate(list(df.columns)):
+        values = df[column]
+        if values.dtype != object:
+            continue
+        blank = values.map(_is_blank)
+        present = values[values.notna() & ~blank]
+        kinds = set(present.map(_value_kind))
+        if kinds in ({KIND_INT}, {KIND_FLOAT}):
+            df[column] = pd.to_numeric(values.where(~blank, None))
+            columns['blank_numeric'].append(column)
+            if kinds == {KIND_INT}:
+                columns['integer'].append(column)
+            continue
+        if values.map(lambda v: v is pd.NA).any():
+            columns['pd_na'].append(column)
+        df[column] = values.map(lambda v: v if isinstance(v, str) else (None if pd.isna(v) else str(v)))
+        if kinds - {KIND_TEXT}:
+            kinds_column = f"__kind_{position}"
+            df[kinds_column] = values.map(_value_kind).astype("int8")
+            columns['mixed'][column] = kinds_column
+    return df, columns
+
+def _restore_numbers(values, kinds):
+    """Строки смешанной колонки → int/float по сохраненному виду"""
+    restored = values.to_numpy(dtype=object, copy=True)
+    for i, kind in enumerate(kinds):
+        if kind == KIND_INT and isinstance(restored[i], str):
+            restored[i] = int(restored[i])
+        elif kind == KIND_FLOAT and isinstance(restored[i], str):
+            restored[i] = float(restored[i])
+    return pd.Series(restored, index=values.index, dtype=object)
+
+def _from_arrow_frame(df, columns):
+    for column in columns['blank_numeric']:
+        values = df[column]
+        # Series.map вернул бы float64: собираем объектную колонку с int вручную
+        restored = [
+            "" if pd.isna(value) else (int(value) if column in columns['integer'] else value)
+            for value in values
+        ]
+        df[column] = pd.Series(restored, index=df.index, dtype=object)
+    for column, kinds_column in columns.get('mixed', {}).items():
+        df[column] = _restore_numbers(df[column], df.pop(kinds_column))
+    for column in df.columns:
+        if column in columns['blank_numeric'] or df[column].dtype != object:
+            continue
+        # Пустые ячейки: pd.NA (как у image) или NaN (колонки, которых нет на части листов)
+        missing = pd.NA if column in columns['pd_na'] else float('nan')
+        df[column] = df[column].where(df[column].notna(), missing)
+    return df
+
+
+# --- Снимок на диске (Arrow IPC, читается через memory map) ---
+def read_snapshot_metadata(snapshot_path):
+    """Метаданные снимка или None, если снимка нет / он битый"""
+    if pa is None:
+        return None
+    try:
+        with pa.memory_map(snapshot_path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(metadata[SNAPSHOT_METADATA_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+
+def read_snapshot(snapshot_path):
+    with pa.memory_map(snapshot_path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    metadata = json.loads(table.schema.metadata[SNAPSHOT_METADATA_KEY])
+    return _from_arrow_frame(table.to_pandas(), metadata['columns'])
+
+def write_snapshot(df, snapshot_path, metadata):
+    arrow_df, columns = _to_arrow_frame(df)
+    metadata = dict(metadata, columns=columns, format=SNAPSHOT_FORMAT_VERSION)
+    table = pa.Table.from_pandas(arrow_df, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SNAPSHOT_METADATA_KEY: json.dumps(metadata).encode("utf-8"),
+    })
+    # Пишем во временный файл и переименовываем, чтобы читатели не видели недописанный
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, snapshot_path)
+
+
+# Результат компиляции: changed_sheets - перечитанные листы ([] - ничего, None - вся книга),
+# fingerprints - отпечатки листов этой версии (None, если их не удалось посчитать)
+CatalogBuild = namedtuple('CatalogBuild', ['df', 'changed_sheets', 'fingerprints'])
+
+
+def _fingerprints_or_none(catalog_path):
+    try:
+        return sheet_fingerprints(catalog_path)
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+
+
+def _metadata_fingerprints(sheets):
+    if not sheets or any(sheet.get('fingerprint') is None for sheet in sheets.values()):
+        return None
+    return {sheet_name: sheet['fingerprint'] for sheet_name, sheet in sheets.items()}
+
+
+def compile_catalog_changes(catalog_path=CATALOG_PATH, snapshot_path=None, force=False):
+    """Обновляет снимок, если xlsx изменился: перечитывает только листы с новым отпечатком"""
+    if pa is None:
+        return CatalogBuild(build_catalog(catalog_path), None, _fingerprints_or_none(catalog_path))
+
+    snapshot_path = snapshot_path or snapshot_path_for(catalog_path)
+    stamp = source_stamp(catalog_path)
+    metadata = None if force else read_snapshot_metadata(snapshot_path)
+    sha256 = file_sha256(catalog_path) if not metadata or metadata.get('source') != stamp else None
+    fingerprints = None
+
+    if metadata and metadata.get('format') == SNAPSHOT_FORMAT_VERSION:
+        previous_fingerprints = _metadata_fingerprints(metadata.get('sheets'))
+        if metadata.get('source') == stamp:
+            return CatalogBuild(read_snapshot(snapshot_path), [], previous_fingerprints)
+        # mtime поменялся, но содержимое то же (например, файл пересохранили)
+        if metadata.get('sha256') == sha256:
+            df = read_snapshot(snapshot_path)
+            write_snapshot(df, snapshot_path, dict(metadata, source=stamp))
+            return CatalogBuild(df, [], previous_fingerprints)
+        # Изменились не все листы: остальные берем из прошлого снимка
+        fingerprints = _fingerprints_or_none(catalog_path)
+        if fingerprints and previous_fingerprints:
+            df, sheets, changed = splice_catalog(
+                read_snapshot(snapshot_path), catalog_path, fingerprints, metadata['sheets']
+            )
+            _try_write_snapshot(df, snapshot_path, stamp, sha256, sheets)
+            return CatalogBuild(df, changed, fingerprints)
+
+    # Полная сборка
+    frames = read_sheets(catalog_path)
+    df = finalize_catalog(list(frames.values()))
+    fingerprints = fingerprints or _fingerprints_or_none(catalog_path)
+    sheets = {
+        sheet_name: {
+            'fingerprint': fingerprints.get(sheet_name) if fingerprints else None,
+            'columns': _sheet_columns(sheet_data),
+        }
+        for sheet_name, sheet_data in frames.items()
+    }
+    _try_write_snapshot(df, snapshot_path, stamp, sha256, sheets)
+    return CatalogBuild(df, None, fingerprints)
+
+
+def _try_write_snapshot(df, snapshot_path, stamp, sha256, sheets):
+    try:
+        write_snapshot(df, snapshot_path, {'source': stamp, 'sha256': sha256, 'sheets': sheets})
+    except OSError:
+        pass
+
+
+def compile_catalog(catalog_path=CATALOG_PATH, snapshot_path=None, force=False):
+    """Пересобирает снимок, если xlsx изменился (по mtime, хэшу, затем по листам). Возвращает DataFrame"""
+    return compile_catalog_changes(catalog_path, snapshot_path, force).df
+
+
+def load_catalog(catalog_path=CATALOG_PATH):
+    """Нормализованный каталог: из снимка, а при изменении xlsx - с пересборкой"""
+    return compile_catalog(catalog_path)
+
+
+if __name__ == "__main__":
+    # python -m components.catalog - принудительная сборка снимка
+    catalog = compile_catalog(force=True)
+    print(f"Снимок каталога: {snapshot_path_for(CATALOG_PATH)} ({len(catalog)} строк)")
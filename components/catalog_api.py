@@ -0,0 +1,160 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+from components.catalog import available_rows_mask, group_keys
+from components.catalog_query import FilterSpec
+from components.facets import PRODUCT_KEY
+from components.image_index import get_image_paths
+from components.static_images import FLASK_URL_PREFIX, image_url
+
+# --- Константы ---
+# Сколько ответов для разных фильтров держим на одну версию каталога
+API_CACHE_SIZE = 256
+# Меньше этого gzip не окупается
+GZIP_MIN_BYTES = 1024
+# Размеры картинок в ответах (CSS px): карточка списка и галерея товара
+LIST_IMAGE_SIZE = (400, 350)
+DETAIL_IMAGE_SIZE = (800, None)
+
+# Готовый ответ: JSON байты, их gzip (None для маленьких) и сильный ETag
+Payload = namedtuple('Payload', ['body', 'gzip', 'etag', 'headers'])
+
+
+def make_payload(data, headers=None):
+    """Сериализует ответ один раз: компактный JSON, gzip и ETag по содержимому"""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    compressed = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+    return Payload(body, compressed, hashlib.sha256(body).hexdigest()[:32], headers or {})
+
+
+def _price(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    # Округляем до тысяч, как в каталоге
+    return None if pd.isna(value) else round(value / 1000) * 1000
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+class CatalogApi:
+    """Ответы /api/products и /api/facets для одной версии каталога.
+
+    Товары и их JSON собираются один раз при создании; ответы для
+    фильтров сериализуются при первом запросе и дальше отдаются готовыми.
+    """
+
+    def __init__(self, df, engine, url_prefix=FLASK_URL_PREFIX, cache_size=API_CACHE_SIZE):
+        self.engine = engine
+        self.version = engine.version
+        self.url_prefix = url_prefix
+        self.cache_size = cache_size
+        self._items = {}
+        self._details = {}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+        sizes = self._sizes_by_product(df)
+        for key, summary in engine.products.items():
+            item = self._item(summary)
+            self._items[key] = item
+            self._details[item['id']] = make_payload(
+                dict(item, images=self._images(summary['image'], DETAIL_IMAGE_SIZE), sizes=sizes.get(key, []))
+            )
+
+    # --- Сборка товаров ---
+    def _images(self, image_names, display_size):
+        urls = (image_url(path, display_size, self.url_prefix) for path in get_image_paths(image_names))
+        return [url for url in urls if url]
+
+    def _item(self, summary):
+        record = summary['record']
+        return {
+            'id': summary['id'],
+            'brand': summary['brand'],
+            'model': summary['model'],
+            'color': summary['color'],
+            'gender': summary['gender'],
+            'description': _text(record.get('description')),
+            'price': summary['min_price'],
+            'sku': _text(record.get('sku')),
+            'in_stock': summary['in_stock'],
+            'eu_sizes': summary['eu_sizes'],
+            'images': self._images(summary['image'], LIST_IMAGE_SIZE),
+        }
+
+    @staticmethod
+    def _sizes_by_product(df):
+        """Размеры товара с ценой и наличием для ответа /api/products/<id>"""
+        if df.empty:
+            return {}
+        available = available_rows_mask(df)
+        prices = df['price'] if 'price' in df.columns else pd.Series(None, index=df.index)
+        sizes = {}
+        for key, size_eu, size_us, price, in_stock in zip(
+            group_keys(df, PRODUCT_KEY), df['size_eu'], df['size US'], prices, available
+        ):
+            size_us = _text(size_us)
+            if size_us in ("", "nan"):
+                continue
+            sizes.setdefault(key, []).append({
+                'size_eu': _text(size_eu),
+                'size_us': size_us,
+                'price': _price(price),
+                'in_stock': bool(in_stock),
+            })
+        return sizes
+
+    # --- Ответы ---
+    def _cached(self, key, build):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        payload = build()
+        with self._lock:
+            self._memo[key] = payload
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return payload
+
+    def products(self, spec=None, **filters):
+        """Список товаров по фильтрам (JSON массив); всего товаров - в X-Total-Count"""
+        spec = self.engine.normalize(spec or FilterSpec(**filters))
+
+        def build():
+            result = self.engine.query(spec)
+            items = [self._items[product['key']] for product in result.products]
+            return make_payload(items, {'X-Total-Count': str(result.total)})
+
+        return self._cached(('products', spec), build)
+
+    def product(self, product_id):
+        """Товар со всеми фото и размерами или None"""
+        return self._details.get(product_id)
+
+    def facets(self, spec=None, **filters):
+        """Значения фасетов и сколько товаров даст каждое при остальных фильтрах"""
+        spec = self.engine.normalize(spec or FilterSpec(**filters))._replace(page=1, page_size=None)
+
+        def build():
+            result = self.engine.query(spec)
+            return make_payload({
+                'total': result.total,
+                'options': self.engine.options,
+                'counts': result.facet_counts,
+            })
+
+        return self._cached(('facets', spec), build)
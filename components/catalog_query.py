@@ -0,0 +1,213 @@
+import math
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from components import instrumentation
+from components.catalog import available_rows_mask, group_keys
+from components.facets import FacetIndex, FACET_COLUMNS, PRODUCT_KEY, ALL
+from components.sizes import sort_sizes
+
+# --- Константы ---
+GENDER_OPTIONS = ["men", "women", "unisex"]
+# Сколько результатов запросов держим на одну версию каталога
+QUERY_CACHE_SIZE = 512
+
+# Спецификация фильтра: пустое значение / None / "Все" - фасет не фильтруется.
+# search - поиск по подстроке в названии модели, page начинается с 1,
+# page_size=None - все товары одной страницей
+FilterSpec = namedtuple(
+    'FilterSpec',
+    ['brand', 'model', 'size', 'gender', 'color', 'search', 'page', 'page_size'],
+    defaults=(None, None, None, None, None, None, 1, None),
+)
+
+QueryResult = namedtuple('QueryResult', ['products', 'total', 'page', 'pages', 'facet_counts'])
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in ("", ALL) else value
+
+
+# --- Сводка по товару (brand, model_clean, color) ---
+def build_product_summaries(df, previous=None, affected=None):
+    """Наличие, минимальная цена, EU размеры и фото для каждой группы товара.
+
+    Если переданы прошлые сводки и затронутые ключи, пересчитываются
+    только группы из affected, остальные берутся из previous.
+    """
+    if df.empty:
+        return {}
+
+    summaries = {}
+    if previous is not None and affected is not None:
+        summaries = {key: summary for key, summary in previous.items() if key not in affected}
+        df = df[group_keys(df, PRODUCT_KEY).isin(affected)]
+
+    available = available_rows_mask(df)
+    prices = pd.to_numeric(df['price'], errors='coerce') if 'price' in df.columns else pd.Series(float('nan'), index=df.index)
+    has_image = df['image'].notna() & (df['image'].astype(str).str.strip() != "")
+
+    for key, group in df.groupby(PRODUCT_KEY, sort=False):
+        group_available = available.loc[group.index]
+        in_stock = bool(group_available.any())
+
+        min_price = None
+        if in_stock:
+            available_prices = prices.loc[group.index][group_available].dropna()
+            if not available_prices.empty:
+                # Округляем до тысяч
+                min_price = round(available_prices.min() / 1000) * 1000
+
+        sizes = [size for size in group['size_eu'][group_available] if size]
+        with_image = group[has_image.loc[group.index]]
+        first_row = with_image.iloc[0] if not with_image.empty else group.iloc[0]
+
+        brand, model, color = key
+        summaries[key] = {
+            'key': key,
+            'id': first_row['product_id'],
+            'brand': brand,
+            'model': model,
+            'color': color,
+            'gender': first_row['gender'],
+            'in_stock': in_stock,
+            'min_price': min_price,
+            'eu_sizes': sort_sizes(list(dict.fromkeys(sizes))),
+            'image': first_row['image'],
+            'record': dict(first_row),
+        }
+    return summaries
+
+
+class CatalogQueryEngine:
+    """Запросы к каталогу для Streamlit и Flask: фильтр → страница товаров + счетчики фасетов.
+
+    Строится один раз на версию каталога. Результаты запросов запоминаются
+    по (версия, FilterSpec), так что повторный запрос - обращение к словарю.
+    """
+
+    def __init__(self, facet_index, products, options, models_by_brand, version=None,
+                 cache_size=QUERY_CACHE_SIZE):
+        self.facet_index = facet_index
+        self.products = products
+        self.options = options
+        self.models_by_brand = models_by_brand
+        self.version = version
+        self.cache_size = cache_size
+        # Сводка товара по product_id (ссылки и URL страниц товара)
+        self.by_id = {summary['id']: summary for summary in products.values()}
+        # Значения фасетов без учета регистра (Flask передает их из URL)
+        self._aliases = {
+            facet: {str(value).lower(): value for value in values}
+            for facet, values in options.items()
+        }
+        self._models_lower = [str(model).lower() for _, model, _ in facet_index.keys]
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_catalog(cls, df, version=None, previous=None, affected=None):
+        """previous/affected - прошлый движок и ключи товаров из измененных листов"""
+        facet_index = FacetIndex.from_catalog(df)
+        if df.empty:
+            options = {facet: [] for facet in FACET_COLUMNS}
+            models_by_brand = {}
+        else:
+            options = {
+                'brand': sorted(df['brand'].unique().tolist()),
+                'model': sorted(df['model_clean'].unique().tolist()),
+                'size': sort_sizes(list(facet_index.postings['size'])),
+                'gender': list(GENDER_OPTIONS),
+                'color': sorted(df['color'].dropna().unique().tolist()),
+            }
+            models_by_brand = {
+                brand: sorted(models.unique().tolist())
+                for brand, models in df.groupby('brand')['model_clean']
+            }
+        products = build_product_summaries(df, previous.products if previous else None, affected)
+        return cls(facet_index, products, options, models_by_brand, version)
+
+    # --- Нормализация спецификации ---
+    def normalize(self, spec):
+        """FilterSpec с каноническими значениями фасетов (для ключа кэша)"""
+        values = {}
+        for facet in FACET_COLUMNS:
+            value = _clean(getattr(spec, facet))
+            if value is not None:
+                value = self._aliases[facet].get(value.lower(), value)
+            values[facet] = value
+        search = _clean(spec.search)
+        page_size = int(spec.page_size) if spec.page_size else None
+        return FilterSpec(
+            search=search.lower() if search else None,
+            page=max(int(spec.page or 1), 1),
+            page_size=page_size if page_size and page_size > 0 else None,
+            **values,
+        )
+
+    # --- Запросы ---
+    def filters(self, spec):
+        return {facet: getattr(spec, facet) for facet in FACET_COLUMNS}
+
+    def _select(self, spec):
+        positions = self.facet_index.select(self.filters(spec))
+        if spec.search:
+            positions = np.array(
+                [p for p in positions if spec.search in self._models_lower[p]], dtype=np.int64
+            )
+        return positions
+
+    def facet_counts(self, spec):
+        """Сколько товаров даст каждое значение фасета при остальных фильтрах"""
+        filters = self.filters(spec)
+        return {
+            facet: self.facet_index.counts(facet, filters, values=self.options[facet])
+            for facet in FACET_COLUMNS
+        }
+
+    def _run(self, spec):
+        positions = self._select(spec)
+        total = int(positions.size)
+        if spec.page_size:
+            pages = max(math.ceil(total / spec.page_size), 1)
+            page = min(spec.page, pages)
+            start = (page - 1) * spec.page_size
+            positions = positions[start:start + spec.page_size]
+        else:
+            pages, page = 1, 1
+        products = [self.products[key] for key in self.facet_index.product_keys(positions)]
+        return QueryResult(products, total, page, pages, self.facet_counts(spec))
+
+    def query(self, spec=None, **filters):
+        """Товары страницы и счетчики фасетов; результат запоминается по (версия, спецификация)"""
+        spec = self.normalize(spec or FilterSpec(**filters))
+        key = (self.version, spec)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                instrumentation.count("query_cache.hit")
+                return self._memo[key]
+
+        instrumentation.count("query_cache.miss")
+        result = self._run(spec)
+        with self._lock:
+            self._memo[key] = result
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return result
+
+    def models_for(self, brand=None):
+        """Модели для выпадающего списка (в рамках бренда, если он выбран)"""
+        brand = _clean(brand)
+        if brand is None:
+            return self.options['model']
+        return self.models_by_brand.get(self._aliases['brand'].get(brand.lower(), brand), [])
+
+    def __len__(self):
+        return len(self.facet_index)
@@ -0,0 +1,15 @@
+import streamlit as st
+
+from components.catalog import CATALOG_PATH
+from components.catalog_watcher import CatalogSnapshot, CatalogWatcher
+
+
+@st.cache_resource(show_spinner=False)
+def get_catalog_watcher(catalog_path=CATALOG_PATH):
+    """Один наблюдатель за xlsx на процесс Streamlit"""
+    return CatalogWatcher(catalog_path).start()
+
+
+def get_catalog(catalog_path=CATALOG_PATH):
+    """Текущая версия каталога; новая собирается в фоне при изменении файла"""
+    return get_catalog_watcher(catalog_path).current
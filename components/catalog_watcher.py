@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+
+from components.catalog import CATALOG_PATH, compile_catalog_changes, group_keys, source_stamp
+from components.catalog_api import CatalogApi
+from components.catalog_query import CatalogQueryEngine
+from components.facets import PRODUCT_KEY
+from components.variants import MODEL_KEY, build_variant_tree, index_variants
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # без inotify_simple опрашиваем mtime файла
+    INotify = None
+
+# --- Константы ---
+# Как часто (в секундах) проверять mtime xlsx, если inotify недоступен
+POLL_INTERVAL = 1.0
+# Сколько ждать после изменения, пока файл допишется (Excel сохраняет в несколько приемов)
+SETTLE_DELAY = 0.5
+
+
+def catalog_version(catalog_path=CATALOG_PATH):
+    """Версия каталога - mtime и размер xlsx: меняется только вместе с файлом"""
+    stamp = source_stamp(catalog_path)
+    return (stamp['mtime_ns'], stamp['size'])
+
+
+class CatalogSnapshot:
+    """Одна версия каталога для всех страниц: DataFrame и индексы по нему.
+
+    Индексы строятся лениво при первом обращении и дальше переиспользуются
+    всеми страницами и сессиями процесса. DataFrame общий - его нельзя менять.
+    Если известна прошлая версия и измененные листы, сводки товаров и дерево
+    вариантов пересчитываются только для групп с этих листов.
+    """
+
+    def __init__(self, df, version, fingerprints=None, previous=None):
+        self.df = df
+        self.version = version
+        self.fingerprints = fingerprints
+        self._lock = threading.Lock()
+        self._query_engine = None
+        self._variant_tree = None
+        self._variant_index = None
+        self._api = None
+        self._previous = None
+        self.changed_sheets = None
+        # Склеивать можно только при известных отпечатках и тех же колонках,
+        # иначе записи товаров разойдутся с полной сборкой
+        if (
+            previous is not None and fingerprints and previous.fingerprints
+            and list(previous.df.columns) == list(df.columns)
+        ):
+            sheet_names = set(fingerprints) | set(previous.fingerprints)
+            self.changed_sheets = sorted(
+                sheet_name for sheet_name in sheet_names
+                if fingerprints.get(sheet_name) != previous.fingerprints.get(sheet_name)
+            )
+            self._previous = previous
+
+    def _affected(self, columns):
+        """Ключи групп со строками на измененных листах (в старой или новой версии)"""
+        keys = set()
+        for df in (self._previous.df, self.df):
+            keys.update(group_keys(df[df['sheet'].isin(self.changed_sheets)], columns))
+        return keys
+
+    @property
+    def query_engine(self):
+        """Фильтры и счетчики фасетов (главная страница, Flask)"""
+        if self._query_engine is None:
+            with self._lock:
+                if self._query_engine is None:
+                    previous = self._previous
+                    if previous is not None:
+                        self._query_engine = CatalogQueryEngine.from_catalog(
+                            self.df, version=self.version,
+                            previous=previous.query_engine, affected=self._affected(PRODUCT_KEY),
+                        )
+                    else:
+                        self._query_engine = CatalogQueryEngine.from_catalog(self.df, version=self.version)
+        return self._query_engine
+
+    @property
+    def variant_tree(self):
+        """Цвета и размеры каждой модели (страница товара)"""
+        if self._variant_tree is None:
+            with self._lock:
+                if self._variant_tree is None:
+                    previous = self._previous
+                    if previous is not None:
+                        self._variant_tree = build_variant_tree(
+                            self.df, previous.variant_tree, self._affected(MODEL_KEY)
+                        )
+                    else:
+                        self._variant_tree = build_variant_tree(self.df)
+        return self._variant_tree
+
+    @property
+    def variant_index(self):
+        """product_id → (варианты модели, цвет) (страница товара по ссылке)"""
+        if self._variant_index is None:
+            variant_tree = self.variant_tree  # до блокировки: свойство берет ту же блокировку
+            with self._lock:
+                if self._variant_index is None:
+                    self._variant_index = index_variants(variant_tree)
+        return self._variant_index
+
+    def find_product(self, product_id):
+        """Варианты модели и цвет товара или (None, None)"""
+        return self.variant_index.get(product_id, (None, None))
+
+    @property
+    def api_built(self):
+        return self._api is not None
+
+    @property
+    def api(self):
+        """Готовые JSON ответы для /api/... (Flask)"""
+        if self._api is None:
+            query_engine = self.query_engine  # до блокировки: свойство берет ту же блокировку
+            with self._lock:
+                if self._api is None:
+                    self._api = CatalogApi(self.df, query_engine)
+        return self._api
+
+    def warm_up(self):
+        """Строит все индексы заранее, чтобы первый запрос их не ждал"""
+        self.query_engine
+        self.variant_tree
+        self.variant_index
+        # Прошлая версия больше не нужна - не держим ее в памяти
+        self._previous = None
+        return self
+
+    def __len__(self):
+        return len(self.df)
+
+
+def load_snapshot(catalog_path=CATALOG_PATH, previous=None):
+    """Новая версия каталога; previous - текущая версия для частичной пересборки"""
+    version = catalog_version(catalog_path)
+    build = compile_catalog_changes(catalog_path)
+    snapshot = CatalogSnapshot(build.df, version, build.fingerprints, previous).warm_up()
+    # Прошлая версия уже отдавала /api/... (Flask): готовим ответы здесь, в потоке
+    # наблюдателя, а не на первом запросе после подмены
+    if previous is not None and previous.api_built:
+        snapshot.api
+    return snapshot
+
+
+class CatalogWatcher:
+    """Следит за xlsx в фоновом потоке и подменяет каталог целиком.
+
+    Новая версия собирается вне запросов; читатели берут current и никогда
+    не ждут перезагрузки. Пока файл не менялся, чтение ничего не стоит.
+    """
+
+    def __init__(self, catalog_path=CATALOG_PATH, poll_interval=POLL_INTERVAL, settle_delay=SETTLE_DELAY):
+        self.catalog_path = catalog_path
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self.last_error = None
+        self.reloads = 0
+        self.reload_failures = 0
+        # Длительность сборки каталога (секунды): последняя и сумма по перезагрузкам
+        self.last_reload_seconds = None
+        self.reload_seconds_total = 0.0
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        """Текущая версия каталога (атомарно подменяется при перезагрузке)"""
+        return self._snapshot
+
+    def start(self):
+        """Первая загрузка (синхронно) и запуск фонового потока"""
+        if self._snapshot is None:
+            started = time.perf_counter()
+            self._snapshot = load_snapshot(self.catalog_path)
+            self.last_reload_seconds = time.perf_counter() - started
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает поток: ждет конца текущего опроса или перезагрузки"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # --- Перезагрузка ---
+    def reload_if_changed(self):
+        """Пересобирает каталог, если версия файла отличается от текущей"""
+        try:
+            version = catalog_version(self.catalog_path)
+            if self._snapshot is not None and version == self._snapshot.version:
+                return False
+            # Ждем, пока файл перестанет меняться
+            time.sleep(self.settle_delay)
+            if catalog_version(self.catalog_path) != version:
+                return False
+            started = time.perf_counter()
+            snapshot = load_snapshot(self.catalog_path, self._snapshot)
+        except Exception as e:
+            # Оставляем прежнюю версию, попробуем при следующем изменении
+            self.last_error = e
+            self.reload_failures += 1
+            return False
+        duration = time.perf_counter() - started
+        self._snapshot = snapshot
+        self.last_error = None
+        self.reloads += 1
+        self.last_reload_seconds = duration
+        self.reload_seconds_total += duration
+        return True
+
+    # --- Фоновый поток ---
+    def _run(self):
+        if INotify is not None:
+            try:
+                self._watch_inotify()
+                return
+            except OSError:
+                pass
+        self._watch_polling()
+
+    def _watch_polling(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def _watch_inotify(self):
+        # Следим за папкой: редакторы часто сохраняют через новый файл + переименование
+        directory = os.path.dirname(os.path.abspath(self.catalog_path))
+        filename = os.path.basename(self.catalog_path)
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE
+        with INotify() as inotify:
+            inotify.add_watch(directory, mask)
+            # Изменения между первой загрузкой и подпиской
+            self.reload_if_changed()
+            while not self._stop.is_set():
+                events = inotify.read(timeout=int(self.poll_interval * 1000))
+                if any(event.name == filename for event in events):
+                    self.reload_if_changed()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from components.catalog import available_rows_mask
+
+# --- Ключ товара и фасеты фильтра ---
+PRODUCT_KEY = ['brand', 'model_clean', 'color']
+FACET_COLUMNS = {
+    'brand': 'brand',
+    'model': 'model_clean',
+    'size': 'size_eu',
+    'gender': 'gender',
+    'color': 'color',
+}
+# Фильтр по полу с учетом unisex
+GENDER_EXPANSION = {
+    'men': ('men', 'unisex'),
+    'women': ('women', 'unisex'),
+}
+ALL = "Все"
+
+_EMPTY = np.array([], dtype=np.int64)
+
+
+class FacetIndex:
+    """Инвертированный индекс: значение фасета → отсортированный массив номеров товаров.
+
+    Товар - группа (brand, model_clean, color), у которой есть хотя бы один
+    размер в наличии. Комбинация фильтров - пересечение массивов.
+    """
+
+    def __init__(self, keys, postings):
+        self.keys = keys
+        self.postings = postings
+        self.universe = np.arange(len(keys), dtype=np.int64)
+
+    @classmethod
+    def from_catalog(cls, df):
+        if df.empty:
+            return cls([], {facet: {} for facet in FACET_COLUMNS})
+
+        grouped = df.groupby(PRODUCT_KEY, sort=True)
+        group_ids = grouped.ngroup().to_numpy()
+        all_keys = list(grouped.size().index)
+
+        available = available_rows_mask(df).to_numpy() & (group_ids >= 0)
+        # Оставляем только товары, у которых есть размер в наличии
+        stocked_groups = np.unique(group_ids[available])
+        positions = np.full(len(all_keys), -1, dtype=np.int64)
+        positions[stocked_groups] = np.arange(len(stocked_groups))
+        keys = [all_keys[group] for group in stocked_groups]
+
+        row_positions = np.where(group_ids >= 0, positions[np.maximum(group_ids, 0)], -1)
+        postings = {}
+        for facet, column in FACET_COLUMNS.items():
+            values = df[column].astype(str).to_numpy()
+            mask = row_positions >= 0
+            if facet == 'size':
+                # Размер учитываем только у строк в наличии
+                mask &= available & (values != "")
+            pairs = pd.DataFrame({'value': values[mask], 'position': row_positions[mask]}).drop_duplicates()
+            postings[facet] = {
+                value: np.sort(group['position'].to_numpy())
+                for value, group in pairs.groupby('value', sort=False)
+            }
+        return cls(keys, postings)
+
+    # --- Запросы ---
+    def matching(self, facet, value):
+        """Номера товаров для одного значения фасета"""
+        if facet == 'gender' and value in GENDER_EXPANSION:
+            parts = [self.postings[facet].get(v, _EMPTY) for v in GENDER_EXPANSION[value]]
+            return np.union1d(*parts)
+        return self.postings[facet].get(value, _EMPTY)
+
+    def select(self, filters, exclude=None):
+        """Номера товаров, подходящих под все фильтры (кроме фасета exclude)"""
+        selected = self.universe
+        for facet, value in filters.items():
+            if facet == exclude or value in (None, "", ALL):
+                continue
+            selected = np.intersect1d(selected, self.matching(facet, value), assume_unique=True)
+        return selected
+
+    def counts(self, facet, filters=None, values=None):
+        """Сколько товаров даст каждое значение фасета при остальных фильтрах"""
+        base = self.select(filters or {}, exclude=facet)
+        if values is None:
+            values = self.postings[facet].keys()
+        return {
+            value: int(np.intersect1d(base, self.matching(facet, value), assume_unique=True).size)
+            for value in values
+        }
+
+    def product_keys(self, positions):
+        return [self.keys[position] for position in positions]
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,200 @@
+import os
+import io
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from components import instrumentation, metrics
+
+# --- Пути и константы ---
+IMAGES_PATH = "data/images"
+THUMBNAILS_PATH = "data/cache/thumbnails"
+DEFAULT_SIZE = (800, 800)
+
+# Сколько base64 строк держим в памяти процесса
+MEMORY_CACHE_SIZE = 256
+PREFETCH_WORKERS = 4
+
+
+# --- Уменьшение изображения (800×800, белый фон, JPEG) ---
+def render_thumbnail(image_path, target_size=DEFAULT_SIZE):
+    """Вписывает изображение в target_size по центру на белом фоне, возвращает JPEG байты"""
+    with Image.open(image_path) as img:
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+
+        # Сохраняем пропорции изображения
+        img.thumbnail(target_size, Image.Resampling.LANCZOS)
+
+        # Создаем новое изображение с белым фоном
+        new_img = Image.new('RGB', target_size, (255, 255, 255))
+
+        # Вычисляем позицию для центрирования
+        x = (target_size[0] - img.size[0]) // 2
+        y = (target_size[1] - img.size[1]) // 2
+
+        # Вставляем изображение по центру
+        new_img.paste(img, (x, y))
+
+        buffer = io.BytesIO()
+        new_img.save(buffer, format='JPEG', quality=90, optimize=True)
+        return buffer.getvalue()
+
+
+# --- Метрики кэша ---
+# Регистрируются при первом обращении к кэшу: процесс без миниатюр (Flask
+# с JSON API и inline фото) не выгружает пустые серии
+_requests_counter = None
+
+
+def _count(result):
+    """Обращение к кэшу по результату (memory_hit, prefetch_wait, disk_hit, render)"""
+    global _requests_counter
+    instrumentation.count(f"thumbnail.{result}")
+    if _requests_counter is None:
+        metrics.callback("dene_thumbnail_cache_memory_entries", "Миниатюр в памяти",
+                         lambda: len(get_thumbnail_cache()))
+        _requests_counter = metrics.counter(
+            "dene_thumbnail_cache_requests_total", "Обращения к кэшу миниатюр по результату", ["result"]
+        )
+    _requests_counter.inc(result)
+
+
+class ThumbnailCache:
+    """Кэш уменьшенных изображений: файлы на диске + LRU base64 строк в памяти.
+
+    Ключ - путь к исходнику, его mtime и целевой размер, поэтому замена
+    файла в data/images автоматически дает новый ключ.
+    """
+
+    def __init__(self, cache_dir=THUMBNAILS_PATH, memory_size=MEMORY_CACHE_SIZE, workers=PREFETCH_WORKERS):
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self.workers = workers
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    # --- Ключи ---
+    @staticmethod
+    def cache_key(image_path, target_size):
+        mtime_ns = os.stat(image_path).st_mtime_ns
+        return (os.path.abspath(image_path), mtime_ns, tuple(target_size))
+
+    def _disk_path(self, key):
+        path, mtime_ns, (width, height) = key
+        digest = hashlib.sha1(f"{path}|{mtime_ns}|{width}x{height}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.jpg")
+
+    # --- Диск ---
+    def get_bytes(self, image_path, target_size=DEFAULT_SIZE, key=None):
+        """JPEG байты миниатюры: с диска, а если нет - рендерим и сохраняем"""
+        key = key or self.cache_key(image_path, target_size)
+        disk_path = self._disk_path(key)
+        try:
+            with open(disk_path, "rb") as f:
+                data = f.read()
+            _count("disk_hit")
+            return data
+        except OSError:
+            pass
+
+        _count("render")
+        data = render_thumbnail(image_path, target_size)
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            # Пишем во временный файл и переименовываем, чтобы не читать недописанный
+            tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            pass
+        return data
+
+    # --- Память ---
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _encode(self, image_path, target_size, key):
+        value = base64.b64encode(self.get_bytes(image_path, target_size, key)).decode("utf-8")
+        self._remember(key, value)
+        return value
+
+    def get_base64(self, image_path, target_size=DEFAULT_SIZE):
+        """base64 миниатюры; повторный вызов - одно обращение к словарю"""
+        key = self.cache_key(image_path, target_size)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                _count("memory_hit")
+                return self._memory[key]
+            pending = self._pending.get(key)
+        if pending is not None:
+            _count("prefetch_wait")
+            return pending.result()
+        return self._encode(image_path, target_size, key)
+
+    def __len__(self):
+        """Сколько миниатюр в памяти"""
+        with self._lock:
+            return len(self._memory)
+
+    # --- Фоновое заполнение ---
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnails")
+        return self._executor
+
+    def _finish(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def prefetch(self, image_paths, target_size=DEFAULT_SIZE):
+        """Ставит в фоновый пул миниатюры, которых еще нет в памяти"""
+        for image_path in dict.fromkeys(image_paths):
+            try:
+                key = self.cache_key(image_path, target_size)
+            except OSError:
+                continue
+            with self._lock:
+                if key in self._memory or key in self._pending:
+                    continue
+                future = self._get_executor().submit(self._encode, image_path, target_size, key)
+                self._pending[key] = future
+            future.add_done_callback(lambda f, key=key: self._finish(key, f))
+
+
+_thumbnail_cache = ThumbnailCache()
+
+
+def get_thumbnail_cache():
+    """Общий на процесс кэш миниатюр"""
+    return _thumbnail_cache
+
+
+def prefetch_thumbnails(image_paths, target_size=DEFAULT_SIZE):
+    """Заполняет кэш миниатюр в фоне (первый рендер страницы)"""
+    _thumbnail_cache.prefetch(image_paths, target_size)
+
+
+def optimize_image_for_telegram(image_path, target_size=DEFAULT_SIZE):
+    try:
+        return _thumbnail_cache.get_base64(image_path, target_size)
+    except Exception:
+        try:
+            with open(image_path, "rb") as img_file:
+                return base64.b64encode(img_file.read()).decode("utf-8")
+        except Exception:
+            fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
+            with open(fallback, "rb") as img_file:
+                return base64.b64encode(img_file.read()).decode("utf-8")
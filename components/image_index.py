@@ -0,0 +1,161 @@
+import os
+import bisect
+import threading
+import time
+
+import pandas as pd
+
+# --- Пути и константы ---
+IMAGES_PATH = "data/images"
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+
+# Как часто (в секундах) проверять mtime папок на изменения
+CHECK_INTERVAL = 2.0
+
+
+class ImageIndex:
+    """Индекс изображений в памяти: имя файла без расширения → пути.
+
+    Дерево папок сканируется один раз. Точные совпадения ищутся по словарю,
+    совпадения по началу имени - бинарным поиском по отсортированному списку.
+    Индекс перестраивается сам, если изменился mtime любой из папок.
+    """
+
+    def __init__(self, root=IMAGES_PATH, check_interval=CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._dir_mtimes = None
+        self._checked_at = 0.0
+        # (точные имена, записи, имена записей): подменяется одним присваиванием,
+        # поиск без блокировки всегда видит согласованную тройку
+        self._state = ({}, [], [])
+
+    # --- Сканирование дерева ---
+    def _scan(self):
+        dir_mtimes = {}
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # Скрытые папки и файлы glob тоже пропускает
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            try:
+                dir_mtimes[dirpath] = os.stat(dirpath).st_mtime
+            except OSError:
+                continue
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                stem, ext = os.path.splitext(filename)
+                if ext not in IMAGE_EXTENSIONS:
+                    continue
+                path = os.path.join(dirpath, filename)
+                entries.append((stem, IMAGE_EXTENSIONS.index(ext), path))
+
+        entries.sort()
+        exact = {}
+        for stem, _, path in entries:
+            exact.setdefault(stem, []).append(path)
+
+        # Сначала индекс, потом mtime: _ensure_fresh без блокировки видит уже готовый индекс
+        self._state = (exact, entries, [stem for stem, _, _ in entries])
+        self._dir_mtimes = dir_mtimes
+
+    def _is_stale(self):
+        for dirpath, mtime in self._dir_mtimes.items():
+            try:
+                if os.stat(dirpath).st_mtime != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._dir_mtimes is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._dir_mtimes is None or self._is_stale():
+                self._scan()
+            self._checked_at = now
+
+    # --- Поиск ---
+    @staticmethod
+    def _prefix_entries(entries, stems, name):
+        start = bisect.bisect_left(stems, name)
+        end = start
+        while end < len(stems) and stems[end].startswith(name):
+            end += 1
+        # Порядок как у glob по расширениям: сначала все .jpg, потом .jpeg и т.д.
+        return sorted(entries[start:end], key=lambda entry: entry[1])
+
+    def find(self, name):
+        """Путь к изображению: сначала точное совпадение имени, затем по началу имени"""
+        self._ensure_fresh()
+        exact, entries, stems = self._state
+        if name in exact:
+            return exact[name][0]
+        matches = self._prefix_entries(entries, stems, name)
+        return matches[0][2] if matches else None
+
+    def find_all(self, name):
+        """Все изображения, имя которых начинается с name"""
+        self._ensure_fresh()
+        _, entries, stems = self._state
+        return [path for _, _, path in self._prefix_entries(entries, stems, name)]
+
+    def find_containing(self, name):
+        """Первое изображение, в имени которого встречается name (линейный поиск в памяти)"""
+        self._ensure_fresh()
+        _, entries, _ = self._state
+        for rank in range(len(IMAGE_EXTENSIONS)):
+            for stem, ext_rank, path in entries:
+                if ext_rank == rank and name in stem:
+                    return path
+        return None
+
+    def __len__(self):
+        self._ensure_fresh()
+        return len(self._state[1])
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_image_index(root=IMAGES_PATH):
+    """Общий на процесс индекс для папки root"""
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = ImageIndex(root)
+        return _indexes[root]
+
+
+def split_image_names(image_names):
+    """Список имен из колонки image (через пробел)"""
+    if image_names is None or image_names is pd.NA:
+        return []
+    if not isinstance(image_names, str) and pd.isna(image_names):
+        return []
+    names = str(image_names).strip()
+    if names.lower() == "nan":
+        return []
+    return names.split()
+
+
+# --- Функции для работы с изображениями ---
+def get_image_path(image_names, images_path=IMAGES_PATH):
+    """Ищет изображение по имени из колонки image"""
+    fallback = os.path.join(images_path, "no_image.jpg")
+    names = split_image_names(image_names)
+    if not names:
+        return fallback
+    return get_image_index(images_path).find(names[0]) or fallback
+
+
+def get_image_paths(image_names, images_path=IMAGES_PATH):
+    """Все изображения для имен из колонки image (для галереи)"""
+    index = get_image_index(images_path)
+    paths = []
+    for name in split_image_names(image_names):
+        paths.extend(index.find_all(name))
+    return list(dict.fromkeys(paths))
@@ -0,0 +1,37 @@
+import os
+import io
+import hashlib
+
+from PIL import Image
+
+# --- Метаданные изображения для экспорта каталога ---
+def image_metadata(image_path):
+    """Размеры, вес и sha256 содержимого (выполняется в пуле процессов)"""
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    width = height = None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+    except Exception:
+        pass
+
+    return {
+        "width": width,
+        "height": height,
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def image_metadata_or_none(image_path):
+    try:
+        return image_metadata(image_path)
+    except OSError:
+        return None
+
+
+def worker_count():
+    """Процессов для пула: по числу ядер, но не больше 8"""
+    return max(1, min(8, os.cpu_count() or 1))
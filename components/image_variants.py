@@ -0,0 +1,259 @@
+import os
+import io
+import json
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from components.image_metadata import worker_count
+
+# --- Пути и константы ---
+IMAGES_PATH = "data/images"
+# Лежит внутри static/derived: Streamlit и Flask отдают варианты как статику
+VARIANTS_PATH = "static/derived/variants"
+MANIFEST_NAME = "manifest.json"
+# Ширины вариантов (по длинной стороне, больше исходника не увеличиваем)
+VARIANT_WIDTHS = (200, 400, 800)
+VARIANT_FORMATS = {
+    'webp': {'ext': '.webp', 'save': {'format': 'WEBP', 'quality': 82, 'method': 6}},
+    'jpeg': {'ext': '.jpg', 'save': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}},
+}
+# Какой формат отдавать в интерфейс (jpeg - для старых браузеров)
+PREFERRED_FORMAT = os.environ.get("IMAGE_VARIANT_FORMAT", "webp").strip().lower()
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def source_key(image_path, images_dir=IMAGES_PATH):
+    """Ключ исходника в манифесте - путь относительно data/images"""
+    relative = os.path.relpath(os.path.abspath(image_path), os.path.abspath(images_dir))
+    return relative.replace("\\", "/")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- Рендер вариантов одного исходника (выполняется в пуле процессов) ---
+def _encode(img, fmt):
+    if fmt == 'jpeg' and img.mode != 'RGB':
+        # JPEG без прозрачности: кладем на белый фон, как миниатюры каталога
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        rgba = img.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        img = background
+    buffer = io.BytesIO()
+    img.save(buffer, **VARIANT_FORMATS[fmt]['save'])
+    return buffer.getvalue()
+
+
+def render_variants(image_path, output_dir, previous=None, widths=VARIANT_WIDTHS):
+    """Запись манифеста для исходника; варианты пересобираются, только если изменился sha256"""
+    stat = os.stat(image_path)
+    sha256 = _file_sha256(image_path)
+    if previous and previous.get('sha256') == sha256 and all(
+        os.path.exists(os.path.join(output_dir, variant['file'])) for variant in previous['variants']
+    ):
+        return dict(previous, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+    variants = []
+    with Image.open(image_path) as img:
+        img.load()
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'P') else 'RGB')
+        source_width, source_height = img.size
+        seen = set()
+        for width in sorted(widths):
+            resized = img.copy()
+            resized.thumbnail((width, width), Image.Resampling.LANCZOS)
+            if resized.size in seen:
+                continue  # исходник меньше этой ширины - вариант совпал бы с предыдущим
+            seen.add(resized.size)
+            for fmt, options in VARIANT_FORMATS.items():
+                data = _encode(resized, fmt)
+                filename = f"{sha256[:20]}_{resized.size[0]}x{resized.size[1]}{options['ext']}"
+                target = os.path.join(output_dir, filename)
+                # Всегда перезаписываем: --force должен заменить и испорченный файл
+                # с тем же именем; os.replace атомарен для параллельных сборок
+                tmp_path = f"{target}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, target)
+                variants.append({
+                    'format': fmt,
+                    'width': resized.size[0],
+                    'height': resized.size[1],
+                    'bytes': len(data),
+                    'file': filename,
+                })
+
+    return {
+        'sha256': sha256,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'width': source_width,
+        'height': source_height,
+        'variants': variants,
+    }
+
+
+def _render_or_none(image_path, output_dir, previous):
+    try:
+        return render_variants(image_path, output_dir, previous)
+    except OSError:
+        return None
+
+
+# --- Манифест ---
+def manifest_path_for(output_dir=VARIANTS_PATH):
+    return os.path.join(output_dir, MANIFEST_NAME)
+
+
+def read_manifest(output_dir=VARIANTS_PATH):
+    try:
+        with open(manifest_path_for(output_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'widths': list(VARIANT_WIDTHS), 'images': {}}
+
+
+def _write_manifest(manifest, output_dir):
+    path = manifest_path_for(output_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def iter_source_images(images_dir=IMAGES_PATH):
+    for root, _, names in os.walk(images_dir):
+        for name in sorted(names):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def build_variants(images_dir=IMAGES_PATH, output_dir=VARIANTS_PATH, force=False, workers=None):
+    """Офлайн-сборка вариантов всех фото в пуле процессов.
+
+    Исходник с тем же mtime и размером пропускается без чтения, с другим -
+    хэшируется, и варианты пересобираются, только если изменилось содержимое.
+    Возвращает (манифест, сколько исходников пересобрано).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    previous_images = {} if force else read_manifest(output_dir)['images']
+    images = {}
+    pending = {}
+    for image_path in iter_source_images(images_dir):
+        key = source_key(image_path, images_dir)
+        previous = previous_images.get(key)
+        stat = os.stat(image_path)
+        if previous and previous['mtime_ns'] == stat.st_mtime_ns and previous['size'] == stat.st_size:
+            images[key] = previous
+        else:
+            pending[key] = (image_path, previous)
+
+    rebuilt = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or worker_count()) as pool:
+            futures = {
+                key: pool.submit(_render_or_none, image_path, output_dir, previous)
+                for key, (image_path, previous) in pending.items()
+            }
+            for key, future in futures.items():
+                entry = future.result()
+                if entry is None:
+                    continue
+                previous = pending[key][1]
+                rebuilt += not previous or previous.get('sha256') != entry['sha256']
+                images[key] = entry
+
+    manifest = {'widths': list(VARIANT_WIDTHS), 'images': dict(sorted(images.items()))}
+    _write_manifest(manifest, output_dir)
+
+    # Файлы, на которые больше не ссылается манифест (исходник удален или изменен)
+    referenced = {variant['file'] for entry in images.values() for variant in entry['variants']}
+    for name in os.listdir(output_dir):
+        if name != MANIFEST_NAME and name not in referenced and not name.endswith('.tmp'):
+            os.remove(os.path.join(output_dir, name))
+    return manifest, rebuilt
+
+
+# --- Выбор варианта при рендере страниц ---
+class VariantIndex:
+    """Манифест вариантов в памяти; перечитывается, когда сборка его обновила"""
+
+    def __init__(self, images_dir=IMAGES_PATH, output_dir=VARIANTS_PATH, preferred_format=PREFERRED_FORMAT):
+        self.images_dir = images_dir
+        self.output_dir = output_dir
+        self.preferred_format = preferred_format if preferred_format in VARIANT_FORMATS else 'webp'
+        self._images = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            stat = os.stat(manifest_path_for(self.output_dir))
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp != self._stamp:
+                self._images = read_manifest(self.output_dir)['images'] if stamp else {}
+                self._stamp = stamp
+
+    def pick(self, image_path, width=None, height=None):
+        """Путь к самому легкому варианту не меньше width×height (CSS px) или None.
+
+        None - вариантов нет или исходник изменился после сборки.
+        """
+        self._refresh()
+        entry = self._images.get(source_key(image_path, self.images_dir))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != (entry['mtime_ns'], entry['size']):
+            return None
+
+        variants = [v for v in entry['variants'] if v['format'] == self.preferred_format]
+        if not variants:
+            return None
+        variants.sort(key=lambda v: v['width'] * v['height'])
+        for variant in variants:
+            if variant['width'] >= (width or 0) and variant['height'] >= (height or 0):
+                return os.path.join(self.output_dir, variant['file'])
+        # Все меньше нужного - берем самый крупный
+        return os.path.join(self.output_dir, variants[-1]['file'])
+
+    def __len__(self):
+        self._refresh()
+        return len(self._images)
+
+
+_variant_index = VariantIndex()
+
+
+def get_variant_index():
+    """Общий на процесс индекс вариантов"""
+    return _variant_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сборка вариантов фото 200/400/800 в WebP и JPEG")
+    parser.add_argument("--force", action="store_true", help="пересобрать все варианты")
+    args = parser.parse_args()
+
+    manifest, rebuilt = build_variants(force=args.force)
+    variants = sum(len(entry['variants']) for entry in manifest['images'].values())
+    print(f"Исходников: {len(manifest['images'])}, пересобрано: {rebuilt}, вариантов: {variants}")
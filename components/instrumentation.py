@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+
+# --- Режим ---
+# off (по умолчанию) | panel - панель в сайдбаре | log - JSON-строки в лог | on - и то и другое
+INSTRUMENTATION = os.environ.get("INSTRUMENTATION", "off").strip().lower()
+# Файл для JSON-строк (по умолчанию stderr, его собирает хостинг)
+INSTRUMENTATION_LOG_FILE = os.environ.get("INSTRUMENTATION_LOG_FILE", "")
+
+LOGGER_NAME = "dene.instrumentation"
+
+_current = contextvars.ContextVar("rerun_metrics", default=None)
+_logger = None
+
+
+def panel_enabled():
+    return INSTRUMENTATION in ("panel", "on", "1", "true")
+
+
+def log_enabled():
+    return INSTRUMENTATION in ("log", "on", "1", "true")
+
+
+def enabled():
+    return panel_enabled() or log_enabled()
+
+
+class RerunMetrics:
+    """Замеры одного прогона страницы: интервалы, счетчики кэшей и объем HTML"""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.counters = {}
+        self.bytes = {}
+        self.info = {}
+
+    def add_span(self, name, seconds):
+        span = self.spans.setdefault(name, {'ms': 0.0, 'count': 0})
+        span['ms'] += seconds * 1000
+        span['count'] += 1
+
+    def record(self):
+        return {
+            'event': 'rerun',
+            'page': self.page,
+            'timestamp': time.time(),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'spans': {name: {'ms': round(span['ms'], 3), 'count': span['count']} for name, span in self.spans.items()},
+            'counters': dict(self.counters),
+            'bytes': dict(self.bytes),
+            'info': dict(self.info),
+        }
+
+
+# --- Запись замеров (без включенной инструментации - пустые вызовы) ---
+def start_rerun(page):
+    """Начинает замеры прогона страницы; None, если инструментация выключена"""
+    metrics = RerunMetrics(page) if enabled() else None
+    _current.set(metrics)
+    return metrics
+
+
+@contextmanager
+def span(name):
+    """Интервал времени; одноименные интервалы за прогон суммируются"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_span(name, time.perf_counter() - start)
+
+
+def count(name, value=1):
+    """Счетчик (попадания/промахи кэшей и т.п.)"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counters[name] = metrics.counters.get(name, 0) + value
+
+
+def add_bytes(name, value):
+    """Сколько байт HTML/base64 отдано за прогон"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.bytes[name] = metrics.bytes.get(name, 0) + value
+
+
+def set_info(**values):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.info.update(values)
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger(LOGGER_NAME)
+        if not logger.handlers:
+            handler = (logging.FileHandler(INSTRUMENTATION_LOG_FILE, encoding="utf-8")
+                       if INSTRUMENTATION_LOG_FILE else logging.StreamHandler(sys.stderr))
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        _logger = logger
+    return _logger
+
+
+def finish_rerun():
+    """Завершает прогон: пишет JSON-строку в лог и возвращает запись (или None)"""
+    metrics = _current.get()
+    if metrics is None:
+        return None
+    _current.set(None)
+    record = metrics.record()
+    if log_enabled():
+        _get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+    return record
+
+
+# --- Панель в сайдбаре Streamlit ---
+def render_panel(record):
+    import streamlit as st
+
+    if record is None or not panel_enabled():
+        return
+    with st.sidebar.expander(f"Инструментация: {record['total_ms']:.0f} мс", expanded=False):
+        for name, value in record['info'].items():
+            st.write(f"{name}: {value}")
+        st.markdown("**Интервалы**")
+        for name, span_data in sorted(record['spans'].items(), key=lambda item: -item[1]['ms']):
+            st.write(f"{name}: {span_data['ms']:.1f} мс × {span_data['count']}")
+        if record['counters']:
+            st.markdown("**Кэши**")
+            for name, value in sorted(record['counters'].items()):
+                st.write(f"{name}: {value}")
+        if record['bytes']:
+            st.markdown("**Объем**")
+            for name, value in sorted(record['bytes'].items()):
+                st.write(f"{name}: {value / 1024:.1f} КБ")
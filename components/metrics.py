@@ -0,0 +1,219 @@
+import abc
+import math
+import threading
+from bisect import bisect_left
+
+# --- Константы ---
+# Границы корзин гистограммы задержек (секунды)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Content-Type текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class _Shards:
+    """Значения серии по потокам: поток пишет только в свой список, без блокировок.
+
+    Список потока создается один раз (gunicorn и пулы потоков переиспользуют
+    потоки), при чтении списки складываются. Списки завершившихся потоков
+    сворачиваются в общий итог, чтобы не копиться.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._shards = []
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def get(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0] * self.size
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    def totals(self):
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    for i, value in enumerate(shard):
+                        self._retired[i] += value
+            self._shards = alive
+            totals = list(self._retired)
+        for _, shard in alive:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class _Metric:
+    """Имя, описание и метки метрики; expose возвращает строки для выгрузки"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _Family(_Metric, abc.ABC):
+    """Метрика с метками: серия на каждый набор значений меток"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_series(self):
+        """Пустая серия для нового набора меток"""
+
+    def _get(self, labels):
+        series = self._series.get(labels)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(labels, self._new_series())
+        return series
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_series(self):
+        return _Shards(1)
+
+    def inc(self, *labels, value=1):
+        self._get(labels).get()[0] += value
+
+    def expose(self):
+        lines = self._header()
+        for labels, series in sorted(self._series.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_format_value(series.totals()[0])}")
+        return lines
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        # Корзины (без накопления), +Inf и сумма
+        return _Shards(len(self.buckets) + 2)
+
+    def observe(self, value, *labels):
+        shard = self._get(labels).get()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def expose(self):
+        lines = self._header()
+        for labels, series in sorted(self._series.items()):
+            totals = series.totals()
+            cumulative = 0
+            for bound, value in zip(self.buckets + (math.inf,), totals):
+                cumulative += value
+                le = (("le", _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format_value(totals[-1])}")
+        return lines
+
+
+class Callback(_Metric):
+    """Значение считается только при выгрузке метрик (размеры каталога, кэшей).
+
+    read возвращает число или {кортеж значений меток: число}; None - пропустить.
+    """
+
+    def __init__(self, name, documentation, read, kind="gauge", labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.read = read
+
+    def expose(self):
+        try:
+            values = self.read()
+        except Exception:
+            return []
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = self._header()
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Регистрирует метрику; повторная регистрация имени возвращает уже существующую"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def expose(self):
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+# --- Общий реестр процесса ---
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def callback(name, documentation, read, kind="gauge", labelnames=()):
+    """Метрика по функции; при повторной регистрации функция заменяется (перезапуск модуля)"""
+    REGISTRY.unregister(name)
+    return REGISTRY.register(Callback(name, documentation, read, kind, labelnames))
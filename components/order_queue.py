@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import logging
+import random
+import sqlite3
+import secrets
+import threading
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Пути и константы ---
+ORDERS_PATH = "data/orders"
+QUEUE_DB_PATH = os.path.join(ORDERS_PATH, "outbox.db")
+# Можно указать локальный сервер-заглушку для проверки (например http://127.0.0.1:8081)
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+# (подключение, чтение) в секундах - медленный Telegram не держит поток дольше
+REQUEST_TIMEOUT = (3.05, 10)
+# Повторы: 2, 4, 8 ... секунд, но не реже раза в 10 минут
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 600.0
+MAX_ATTEMPTS = 12
+# Сколько заказ считается "в работе" у одного отправителя, прежде чем его заберет другой
+CLAIM_TIMEOUT = 60.0
+# Как часто поток проверяет очередь, если его не будили
+IDLE_INTERVAL = 5.0
+
+logger = logging.getLogger("dene.orders")
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+
+def new_order_id():
+    """Номер заказа для покупателя; по нему в чате узнаются повторы сообщения"""
+    return f"{datetime.now():%Y%m%d}-{secrets.token_hex(3).upper()}"
+
+
+def format_order_message(order_id, order_data):
+    """Текст заказа для Telegram"""
+    message = f"НОВЫЙ ЗАКАЗ №{order_id}\n\n"
+    message += f"Клиент: {order_data['customer_name']}\n"
+    message += f"Телефон: {order_data['customer_phone']}\n"
+    message += f"Адрес: {order_data['customer_address']}\n"
+
+    if order_data.get('customer_email'):
+        message += f"Email: {order_data['customer_email']}\n"
+
+    if order_data.get('customer_comment'):
+        message += f"Комментарий: {order_data['customer_comment']}\n"
+
+    message += f"\nТовары:\n"
+
+    total = 0
+    for i, item in enumerate(order_data['items'], 1):
+        # Количество появляется в товаре корзины только после ➕/➖
+        price = item.get('price', 0)
+        quantity = item.get('quantity', 1)
+        item_total = price * quantity
+        total += item_total
+        message += f"{i}. {item.get('brand', '')} {item.get('model', '')}\n"
+        message += f"   Цвет: {item.get('color', '')}\n"
+        message += f"   Размер: {item.get('size', '')}\n"
+        message += f"   Цена: {price:,} ₸ x {quantity} = {item_total:,} ₸\n\n"
+
+    message += f"ИТОГО: {total:,} ₸".replace(",", " ")
+    return message
+
+
+def backoff_delay(attempts):
+    """Экспоненциальная задержка с разбросом, чтобы повторы не шли пачкой"""
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class DeliveryError(Exception):
+    """Заказ не доставлен; retry_after - через сколько повторить (None - по backoff)"""
+
+    def __init__(self, message, permanent=False, retry_after=None):
+        super().__init__(message)
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+
+# --- Очередь заказов на диске ---
+class OrderQueue:
+    """Очередь заказов в SQLite: заказ сначала сохраняется, потом отправляется.
+
+    Запись - одна короткая транзакция, поэтому оформление заказа не ждет
+    Telegram. Повторная постановка заказа с тем же номером ничего не делает.
+    """
+
+    def __init__(self, db_path=QUEUE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    order_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    sent_at REAL,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+
+    def _connect(self):
+        # Свое соединение на поток: sqlite3 не разрешает делить его между потоками
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, order_data, order_id=None):
+        """Сохраняет заказ и возвращает его номер (сразу, без сетевых запросов)"""
+        order_id = order_id or new_order_id()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO outbox (order_id, payload, status, next_attempt, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (order_id, json.dumps(order_data, ensure_ascii=False, default=str), PENDING, now, now),
+            )
+        return order_id
+
+    def claim(self, limit=10):
+        """Забирает заказы, которым пора отправляться; другие отправители их не возьмут до CLAIM_TIMEOUT"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            rows = conn.execute(
+                "SELECT order_id, payload, attempts FROM outbox "
+                "WHERE status = ? AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                (PENDING, now, limit),
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                updated = conn.execute(
+                    "UPDATE outbox SET next_attempt = ? WHERE order_id = ? AND status = ? AND next_attempt <= ?",
+                    (now + CLAIM_TIMEOUT, row['order_id'], PENDING, now),
+                ).rowcount
+                if updated:
+                    claimed.append((row['order_id'], json.loads(row['payload']), row['attempts']))
+        return claimed
+
+    def mark_sent(self, order_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, sent_at = ?, attempts = attempts + 1, last_error = NULL "
+                "WHERE order_id = ?",
+                (SENT, time.time(), order_id),
+            )
+
+    def mark_failed(self, order_id, attempts, error, permanent=False, retry_after=None):
+        """Планирует повтор или, если попытки кончились, помечает заказ как failed"""
+        attempts += 1
+        if permanent or attempts >= MAX_ATTEMPTS:
+            status, next_attempt = FAILED, time.time()
+        else:
+            status = PENDING
+            next_attempt = time.time() + (retry_after if retry_after is not None else backoff_delay(attempts))
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE order_id = ?",
+                (status, attempts, next_attempt, str(error)[:500], order_id),
+            )
+
+    def status(self, order_id):
+        """Статус заказа (pending / sent / failed) или None"""
+        row = self._connect().execute(
+            "SELECT status FROM outbox WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        return row['status'] if row else None
+
+    def next_due(self):
+        """Время ближайшей попытки (time.time()) или None, если ждать нечего"""
+        row = self._connect().execute(
+            "SELECT MIN(next_attempt) AS due FROM outbox WHERE status = ?", (PENDING,)
+        ).fetchone()
+        return row['due']
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+# --- Отправка в Telegram ---
+class TelegramSender:
+    """sendMessage через общий пул соединений с таймаутами.
+
+    Доставка "хотя бы один раз": если Telegram принял сообщение, но ответ
+    не дошел (таймаут чтения), заказ отправится повторно. Дубли узнаются
+    по номеру заказа в первой строке текста.
+    """
+
+    def __init__(self, token, chat_id, api_url=None, timeout=REQUEST_TIMEOUT):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = (api_url or TELEGRAM_API_URL).rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def configured(self):
+        return bool(self.token and self.chat_id)
+
+    def send(self, order_id, order_data):
+        if not self.configured:
+            raise DeliveryError("Telegram бот не настроен")
+        payload = {
+            "chat_id": self.chat_id,
+            "text": format_order_message(order_id, order_data),
+        }
+        try:
+            response = self.session.post(
+                f"{self.api_url}/bot{self.token}/sendMessage", json=payload, timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise DeliveryError(f"Сеть: {e}")
+
+        if response.status_code == 200:
+            return
+        retry_after = None
+        try:
+            retry_after = response.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            pass
+        # 4xx кроме 429 повторять бесполезно (неверный токен, чат, текст)
+        permanent = 400 <= response.status_code < 500 and response.status_code != 429
+        raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", permanent, retry_after)
+
+
+class OrderDispatcher:
+    """Фоновый поток: забирает заказы из очереди и отправляет их с повторами"""
+
+    def __init__(self, queue, sender, idle_interval=IDLE_INTERVAL):
+        self.queue = queue
+        self.sender = sender
+        self.idle_interval = idle_interval
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="order-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Разбудить поток сразу после постановки заказа"""
+        self._wake.set()
+
+    def submit(self, order_data):
+        """Сохраняет заказ в очередь и будит поток; возвращает номер заказа"""
+        order_id = self.queue.enqueue(order_data)
+        self.wake()
+        return order_id
+
+    def run_once(self):
+        """Одна попытка для всех заказов, которым пора; возвращает сколько отправлено"""
+        sent = 0
+        for order_id, order_data, attempts in self.queue.claim():
+            try:
+                self.sender.send(order_id, order_data)
+            except DeliveryError as e:
+                self.last_error = e
+                self.queue.mark_failed(order_id, attempts, e, e.permanent, e.retry_after)
+                continue
+            except Exception as e:
+                # Битый заказ (например, ошибка в данных) не должен останавливать поток:
+                # повтор не поможет, помечаем failed и идем дальше
+                self.last_error = e
+                logger.exception("Заказ %s не отправлен", order_id)
+                self.queue.mark_failed(order_id, attempts, e, permanent=True)
+                continue
+            self.queue.mark_sent(order_id)
+            sent += 1
+        return sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                due = self.queue.next_due()
+            except Exception as e:
+                # Поток живет, пока жив процесс: ошибку пишем в лог и пробуем снова
+                self.last_error = e
+                logger.exception("Ошибка в потоке отправки заказов")
+                due = None
+            timeout = self.idle_interval if due is None else min(max(due - time.time(), 0.05), self.idle_interval)
+            self._wake.wait(timeout)
+            self._wake.clear()
+
@@ -0,0 +1,29 @@
+import os
+
+import streamlit as st
+
+from components.order_queue import QUEUE_DB_PATH, OrderDispatcher, OrderQueue, TelegramSender
+from components.order_store import ORDER_STORE_PATH, OrderStore, OrderWriter
+
+
+@st.cache_resource(show_spinner=False)
+def get_order_dispatcher(db_path=QUEUE_DB_PATH):
+    """Одна очередь заказов и один поток отправки на процесс Streamlit"""
+    sender = TelegramSender(
+        os.environ.get("TELEGRAM_BOT_TOKEN", ""),
+        os.environ.get("TELEGRAM_CHAT_ID", ""),
+    )
+    return OrderDispatcher(OrderQueue(db_path), sender).start()
+
+
+@st.cache_resource(show_spinner=False)
+def get_order_writer(db_path=ORDER_STORE_PATH):
+    """Фоновая запись заказов в хранилище для отчетов"""
+    return OrderWriter(OrderStore(db_path)).start()
+
+
+def place_order(order_data):
+    """Ставит заказ в очередь отправки и в хранилище; возвращает номер заказа"""
+    order_id = get_order_dispatcher().submit(order_data)
+    get_order_writer().submit(order_id, order_data)
+    return order_id
@@ -0,0 +1,277 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+from components.order_queue import ORDERS_PATH
+
+logger = logging.getLogger("dene.orders")
+
+# --- Пути и константы ---
+ORDER_STORE_PATH = os.path.join(ORDERS_PATH, "orders.db")
+# Сколько заказов пишется одной транзакцией и как долго копится пачка (секунды)
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    order_date TEXT NOT NULL,
+    customer_name TEXT,
+    customer_phone TEXT,
+    phone_digits TEXT,
+    customer_address TEXT,
+    customer_email TEXT,
+    customer_comment TEXT,
+    total REAL NOT NULL,
+    quantity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL REFERENCES orders (order_id),
+    line INTEGER NOT NULL,
+    product_key TEXT NOT NULL,
+    brand TEXT,
+    model TEXT,
+    color TEXT,
+    size TEXT,
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line)
+);
+CREATE INDEX IF NOT EXISTS orders_by_date ON orders (order_date);
+CREATE INDEX IF NOT EXISTS orders_by_phone ON orders (phone_digits);
+CREATE INDEX IF NOT EXISTS order_items_by_product ON order_items (product_key);
+"""
+
+
+def phone_digits(phone):
+    """Телефон для поиска: только цифры, 8XXXXXXXXXX → 7XXXXXXXXXX"""
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if len(digits) == 11 and digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits
+
+
+def product_key(item):
+    """Ключ товара в заказе: бренд, модель, цвет"""
+    return "|".join(str(item.get(part, "")).strip() for part in ("brand", "model", "color"))
+
+
+def _number(value, default=0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class OrderStore:
+    """Заказы в SQLite (WAL) с индексами по дате, телефону и товару"""
+
+    def __init__(self, db_path=ORDER_STORE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        # Свое соединение на поток: sqlite3 не разрешает делить его между потоками
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Запись ---
+    def add_many(self, orders):
+        """Пишет пачку [(order_id, order_data, created_at)] одной транзакцией; повторы игнорируются"""
+        order_rows, item_rows = [], []
+        for order_id, order_data, created_at in orders:
+            items = order_data.get('items', [])
+            quantity = sum(int(_number(item.get('quantity', 1), 1)) for item in items)
+            total = sum(_number(item.get('price')) * _number(item.get('quantity', 1), 1) for item in items)
+            order_rows.append((
+                order_id, created_at, datetime.fromtimestamp(created_at).strftime("%Y-%m-%d"),
+                order_data.get('customer_name'), order_data.get('customer_phone'),
+                phone_digits(order_data.get('customer_phone')), order_data.get('customer_address'),
+                order_data.get('customer_email'), order_data.get('customer_comment'),
+                _number(order_data.get('total'), total), quantity,
+            ))
+            for line, item in enumerate(items, 1):
+                item_rows.append((
+                    order_id, line, product_key(item), item.get('brand'), item.get('model'),
+                    item.get('color'), str(item.get('size', '')), _number(item.get('price')),
+                    int(_number(item.get('quantity', 1), 1)),
+                ))
+        with self._connect() as conn:
+            conn.executemany("INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", order_rows)
+            conn.executemany("INSERT OR IGNORE INTO order_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", item_rows)
+        return len(order_rows)
+
+    def add(self, order_id, order_data, created_at=None):
+        return self.add_many([(order_id, order_data, created_at or time.time())])
+
+    # --- Поиск ---
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def get(self, order_id):
+        """Заказ со списком товаров или None"""
+        orders = self._query("SELECT * FROM orders WHERE order_id = ?", (order_id,))
+        if not orders:
+            return None
+        order = orders[0]
+        order['items'] = self._query("SELECT * FROM order_items WHERE order_id = ? ORDER BY line", (order_id,))
+        return order
+
+    def orders_by_phone(self, phone):
+        """Заказы покупателя (телефон в любом формате), новые первыми"""
+        return self._query(
+            "SELECT * FROM orders WHERE phone_digits = ? ORDER BY created_at DESC", (phone_digits(phone),)
+        )
+
+    def orders_between(self, start_date, end_date):
+        """Заказы за период, даты 'YYYY-MM-DD' включительно"""
+        return self._query(
+            "SELECT * FROM orders WHERE order_date BETWEEN ? AND ? ORDER BY created_at", (start_date, end_date)
+        )
+
+    def orders_for_product(self, key):
+        """Строки заказов с товаром (ключ из product_key)"""
+        return self._query(
+            "SELECT o.order_date, o.customer_phone, i.* FROM order_items i "
+            "JOIN orders o USING (order_id) WHERE i.product_key = ? ORDER BY o.created_at", (key,)
+        )
+
+    # --- Отчеты ---
+    def daily_summary(self, start_date="0000-00-00", end_date="9999-99-99"):
+        """По дням: число заказов, штук и выручка"""
+        return self._query(
+            "SELECT order_date, COUNT(*) AS orders, SUM(quantity) AS items, SUM(total) AS revenue "
+            "FROM orders WHERE order_date BETWEEN ? AND ? GROUP BY order_date ORDER BY order_date",
+            (start_date, end_date),
+        )
+
+    def popular_products(self, limit=10):
+        """Самые заказываемые товары: штуки и выручка"""
+        return self._query(
+            "SELECT product_key, brand, model, color, SUM(quantity) AS items, SUM(price * quantity) AS revenue "
+            "FROM order_items GROUP BY product_key ORDER BY items DESC, revenue DESC LIMIT ?", (limit,)
+        )
+
+    def popular_sizes(self, limit=10):
+        """Самые заказываемые размеры"""
+        return self._query(
+            "SELECT size, SUM(quantity) AS items FROM order_items "
+            "GROUP BY size ORDER BY items DESC LIMIT ?", (limit,)
+        )
+
+    def totals(self):
+        """Всего заказов, штук и выручка"""
+        return self._query(
+            "SELECT COUNT(*) AS orders, COALESCE(SUM(quantity), 0) AS items, "
+            "COALESCE(SUM(total), 0) AS revenue FROM orders"
+        )[0]
+
+
+class OrderWriter:
+    """Фоновая запись заказов в OrderStore пачками, вне оформления заказа.
+
+    submit только кладет заказ в очередь в памяти; поток пишет накопленное
+    одной транзакцией. Заказ уже сохранен в очереди отправки (outbox),
+    поэтому хранилище отчетов можно дозаполнить из нее (import_outbox).
+    """
+
+    def __init__(self, store, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_error = None
+        self.written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, order_id, order_data, created_at=None):
+        self._queue.put((order_id, order_data, created_at or time.time()))
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток"""
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _write(self, batch):
+        try:
+            self.written += self.store.add_many(batch)
+        except Exception as e:
+            # Поток не должен умирать из-за одной пачки: иначе следующие заказы
+            # принимаются submit, но не записываются. Пачку можно дозаполнить
+            # из очереди отправки (import_outbox)
+            self.last_error = e
+            logger.exception("Не удалось записать %d заказов в хранилище", len(batch))
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+
+def import_outbox(store, outbox_path):
+    """Дозаполняет хранилище заказами из очереди отправки (повторы пропускаются)"""
+    conn = sqlite3.connect(outbox_path)
+    try:
+        rows = conn.execute("SELECT order_id, payload, created_at FROM outbox").fetchall()
+    finally:
+        conn.close()
+    return store.add_many([(order_id, json.loads(payload), created_at) for order_id, payload, created_at in rows])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from components.order_queue import QUEUE_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Отчет по заказам")
+    parser.add_argument("--import-outbox", action="store_true", help="сначала перенести заказы из очереди отправки")
+    args = parser.parse_args()
+
+    store = OrderStore()
+    if args.import_outbox and os.path.exists(QUEUE_DB_PATH):
+        import_outbox(store, QUEUE_DB_PATH)
+    totals = store.totals()
+    print(f"Заказов: {totals['orders']}, штук: {totals['items']}, выручка: {totals['revenue']:,.0f} ₸".replace(",", " "))
+    for row in store.daily_summary():
+        print(f"  {row['order_date']}: заказов {row['orders']}, штук {row['items']}, {row['revenue']:,.0f} ₸".replace(",", " "))
+    print("Популярные товары:")
+    for row in store.popular_products():
+        print(f"  {row['brand']} {row['model']} ({row['color']}): {row['items']} шт.")
+    print("Популярные размеры:")
+    for row in store.popular_sizes():
+        print(f"  {row['size']}: {row['items']} шт.")
@@ -0,0 +1,65 @@
+import pandas as pd
+
+# --- Таблица конверсии US → EU размеров (запасной вариант) ---
+US_TO_EU_CONVERSION = {
+    # Мужские размеры
+    "5": "37", "5.5": "38", "6": "38.5", "6.5": "39", "7": "40",
+    "7.5": "40.5", "8": "41", "8.5": "42", "9": "42.5", "9.5": "43",
+    "10": "44", "10.5": "44.5", "11": "45", "11.5": "45.5", "12": "46",
+    "12.5": "47", "13": "47.5", "14": "48.5",
+
+    # Для значений с .0
+    "5.0": "37", "6.0": "38.5", "7.0": "40", "8.0": "41", "9.0": "42.5",
+    "10.0": "44", "11.0": "45", "12.0": "46", "13.0": "47.5",
+
+    # Женские размеры
+    "5W": "35.5", "5.5W": "36", "6W": "36.5", "6.5W": "37", "7W": "37.5",
+    "7.5W": "38", "8W": "38.5", "8.5W": "39", "9W": "39.5", "9.5W": "40",
+    "10W": "40.5", "10.5W": "41", "11W": "41.5"
+}
+
+# --- Очистка размеров от .0 (векторно) ---
+def strip_zero_fraction(sizes):
+    """Убирает .0 в конце размера для всей колонки, например 36.0 → 36"""
+    return sizes.str.replace(r'\.0$', '', regex=True)
+
+def _size_strings(df, column):
+    """Колонку размеров в строки без пробелов + маска непустых значений"""
+    sizes = df[column].astype(str).str.strip()
+    return sizes, (sizes != "") & (sizes != "nan")
+
+# --- Колонка size_eu: EU размер из каталога или конверсия из US ---
+def eu_size_column(df):
+    """Возвращает EU размеры для всех строк: сначала size EU, если нет - конверсия из US"""
+    if 'size US' in df.columns:
+        us_sizes, has_us = _size_strings(df, 'size US')
+        us_base = strip_zero_fraction(us_sizes)
+        converted = us_sizes.map(US_TO_EU_CONVERSION).fillna(us_base.map(US_TO_EU_CONVERSION))
+        # Если размер не найден в таблице, оставляем очищенный оригинальный
+        eu_sizes = strip_zero_fraction(converted.fillna(us_base)).where(has_us, "")
+    else:
+        eu_sizes = pd.Series("", index=df.index, dtype=object)
+
+    if 'size EU' in df.columns:
+        catalog_eu, has_eu = _size_strings(df, 'size EU')
+        eu_sizes = strip_zero_fraction(catalog_eu).where(has_eu, eu_sizes)
+
+    return eu_sizes
+
+# --- Функция сортировки размеров ---
+def sort_sizes(size_list):
+    """Сортирует размеры правильно: числа по значению, строки по алфавиту"""
+    numeric_sizes = []
+    string_sizes = []
+    
+    for size in size_list:
+        clean_size = str(size).strip()
+        try:
+            # Пробуем преобразовать в число
+            base_num = float(clean_size)
+            numeric_sizes.append((base_num, clean_size))
+        except:
+            string_sizes.append(clean_size)
+    
+    numeric_sizes.sort(key=lambda x: x[0])
+    return [size[1] for size in numeric_sizes] + sorted(string_sizes)
@@ -0,0 +1,175 @@
+import os
+import base64
+import hashlib
+import threading
+from functools import lru_cache
+
+from components.image_cache import DEFAULT_SIZE, get_thumbnail_cache, optimize_image_for_telegram
+from components import instrumentation
+from components.image_variants import get_variant_index
+
+# --- Режим выдачи изображений ---
+# inline - base64 прямо в HTML (по умолчанию), static - ссылки на файлы в static/derived
+IMAGE_DELIVERY = os.environ.get("IMAGE_DELIVERY", "inline").strip().lower()
+
+# --- Пути и константы ---
+IMAGES_PATH = "data/images"
+STATIC_DERIVED_PATH = "static/derived"
+# Streamlit отдает папку static/ по адресу app/static/ (server.enableStaticServing)
+STREAMLIT_URL_PREFIX = "app/static/derived"
+# Flask отдает ту же папку через static_folder
+FLASK_URL_PREFIX = "/static/derived"
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+}
+
+
+def static_images_enabled():
+    return IMAGE_DELIVERY == "static"
+
+
+class StaticImagePublisher:
+    """Копирует изображения в static/derived под именем из хэша содержимого.
+
+    Имя файла меняется вместе с содержимым, поэтому ссылки можно кэшировать
+    в браузере и CDN без ограничения по времени.
+    """
+
+    def __init__(self, static_dir=STATIC_DERIVED_PATH):
+        self.static_dir = static_dir
+        self._published = {}
+        self._lock = threading.Lock()
+
+    def _write(self, data, ext):
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        filename = f"{digest}{ext}"
+        target = os.path.join(self.static_dir, filename)
+        if not os.path.exists(target):
+            os.makedirs(self.static_dir, exist_ok=True)
+            tmp_path = f"{target}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        return filename
+
+    def _publish(self, key, produce, ext):
+        with self._lock:
+            if key in self._published:
+                return self._published[key]
+        filename = self._write(produce(), ext)
+        with self._lock:
+            self._published[key] = filename
+        return filename
+
+    def publish_thumbnail(self, image_path, target_size=DEFAULT_SIZE):
+        """Имя файла миниатюры (JPEG) в static/derived"""
+        cache = get_thumbnail_cache()
+        key = ('thumbnail',) + cache.cache_key(image_path, target_size)
+        return self._publish(key, lambda: cache.get_bytes(image_path, target_size), '.jpg')
+
+    def publish_original(self, image_path):
+        """Имя файла оригинала в static/derived"""
+        key = ('original', os.path.abspath(image_path), os.stat(image_path).st_mtime_ns)
+        ext = os.path.splitext(image_path)[1].lower()
+
+        def produce():
+            with open(image_path, "rb") as f:
+                return f.read()
+
+        return self._publish(key, produce, ext)
+
+
+_publisher = StaticImagePublisher()
+
+
+def get_static_publisher():
+    """Общий на процесс публикатор static/derived"""
+    return _publisher
+
+
+def static_url(filename, url_prefix=STREAMLIT_URL_PREFIX):
+    # ?v= включает у Streamlit (tornado) долгий Cache-Control
+    return f"{url_prefix}/{filename}?v={os.path.splitext(filename)[0]}"
+
+
+def _data_uri(data_base64, image_path):
+    mime = MIME_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/jpeg')
+    return f"data:{mime};base64,{data_base64}"
+
+
+@lru_cache(maxsize=256)
+def _variant_data_uri(variant_path):
+    # Имя варианта содержит хэш исходника, поэтому кэш не устаревает
+    with open(variant_path, "rb") as f:
+        return _data_uri(base64.b64encode(f.read()).decode("utf-8"), variant_path)
+
+
+def variant_src(image_path, display_size, url_prefix=STREAMLIT_URL_PREFIX):
+    """src самого легкого готового варианта для display_size=(ширина, высота) в CSS px.
+
+    None, если варианты не собраны (python -m components.image_variants).
+    """
+    width, height = display_size
+    variant_path = get_variant_index().pick(image_path, width, height)
+    if variant_path is None:
+        instrumentation.count("image_variant.miss")
+        return None
+    instrumentation.count("image_variant.hit")
+    try:
+        if static_images_enabled():
+            return static_url(os.path.relpath(variant_path, STATIC_DERIVED_PATH).replace("\\", "/"), url_prefix)
+        return _variant_data_uri(variant_path)
+    except OSError:
+        return None
+
+
+def image_url(image_path, display_size=None, url_prefix=FLASK_URL_PREFIX):
+    """Ссылка на изображение для JSON API: готовый вариант или копия оригинала в static/derived.
+
+    Всегда ссылка (не data URI), независимо от IMAGE_DELIVERY; None, если файла нет.
+    """
+    if display_size is not None:
+        variant_path = get_variant_index().pick(image_path, *display_size)
+        if variant_path is not None:
+            return static_url(os.path.relpath(variant_path, STATIC_DERIVED_PATH).replace("\\", "/"), url_prefix)
+    try:
+        return static_url(_publisher.publish_original(image_path), url_prefix)
+    except OSError:
+        return None
+
+
+# --- src для <img>: ссылка или data URI в зависимости от режима ---
+def thumbnail_src(image_path, target_size=DEFAULT_SIZE, url_prefix=STREAMLIT_URL_PREFIX, display_size=None):
+    """src миниатюры для карточки каталога (готовый вариант, если передан display_size)"""
+    if display_size is not None:
+        src = variant_src(image_path, display_size, url_prefix)
+        if src:
+            return src
+    if static_images_enabled():
+        try:
+            return static_url(_publisher.publish_thumbnail(image_path, target_size), url_prefix)
+        except Exception:
+            pass
+    return f"data:image/jpeg;base64,{optimize_image_for_telegram(image_path, target_size)}"
+
+
+def original_src(image_path, url_prefix=STREAMLIT_URL_PREFIX, display_size=None):
+    """src изображения для галереи и корзины: готовый вариант или оригинал"""
+    if display_size is not None:
+        src = variant_src(image_path, display_size, url_prefix)
+        if src:
+            return src
+    fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
+    for path in (image_path, fallback):
+        try:
+            if static_images_enabled():
+                return static_url(_publisher.publish_original(path), url_prefix)
+            with open(path, "rb") as img_file:
+                return _data_uri(base64.b64encode(img_file.read()).decode("utf-8"), path)
+        except Exception:
+            continue
+    return ""
@@ -0,0 +1,81 @@
+import pandas as pd
+
+from components.catalog import available_rows_mask, group_keys
+
+# --- Ключ модели (все цвета) ---
+MODEL_KEY = ['brand', 'model_clean']
+
+
+def round_price(price):
+    """Округляет цену до тысяч; None, если цена не число (пустая ячейка, текст)"""
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(price) else round(price / 1000) * 1000
+
+
+def _size_sort_key(size):
+    us_size = size['us_size']
+    return float(us_size) if us_size.replace('.', '').isdigit() else us_size
+
+
+def build_variant_tree(df, previous=None, affected=None):
+    """Дерево вариантов: (brand, model_clean) → цвета → размеры с EU, ценой и наличием.
+
+    Строится за один проход по каталогу. Страница товара берет из него
+    готовые данные и не фильтрует каталог на каждый размер и цвет.
+    С previous и affected пересобираются только модели из affected.
+    """
+    if df.empty:
+        return {}
+
+    tree = {}
+    if previous is not None and affected is not None:
+        tree = {key: variants for key, variants in previous.items() if key not in affected}
+        df = df[group_keys(df, MODEL_KEY).isin(affected)]
+
+    available = available_rows_mask(df)
+    # Первое непустое значение каждой колонки по цвету (как groupby('color').first())
+    color_records = df.groupby(MODEL_KEY + ['color'], sort=True).first()
+
+    sizes_by_color = {}
+    stocked = df[available]
+    for key, row in zip(
+        zip(stocked['brand'], stocked['model_clean'], stocked['color']),
+        stocked[['size US', 'size_eu', 'price']].itertuples(index=False),
+    ):
+        us_size = str(row[0]).strip()
+        sizes_by_color.setdefault(key, []).append({
+            'us_size': us_size,
+            'eu_size': row[1],
+            'price': round_price(row[2]),
+            'in_stock': 'yes',
+        })
+
+    for (brand, model, color), record in zip(color_records.index, color_records.to_dict('records')):
+        sizes = sorted(sizes_by_color.get((brand, model, color), []), key=_size_sort_key)
+        model_variants = tree.setdefault((brand, model), {'colors': {}, 'stocked_colors': []})
+        model_variants['colors'][color] = {
+            'record': dict(record, brand=brand, model_clean=model, color=color),
+            'sizes': sizes,
+            # Размеры без цены в минимальную цену не входят
+            'min_price': min((size['price'] for size in sizes if size['price'] is not None), default=None),
+        }
+        if sizes:
+            model_variants['stocked_colors'].append(color)
+    return tree
+
+
+def find_variants(tree, brand, model_clean):
+    """Цвета и размеры модели или None, если модели нет в каталоге"""
+    return tree.get((brand, model_clean))
+
+
+def index_variants(tree):
+    """product_id → (варианты модели, цвет) для поиска товара по ключу из URL"""
+    return {
+        color_data['record']['product_id']: (model_variants, color)
+        for model_variants in tree.values()
+        for color, color_data in model_variants['colors'].items()
+    }
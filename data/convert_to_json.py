@@ -1,85 +1,334 @@
 import pandas as pd
+import argparse
+import filecmp
+import gzip
+import hashlib
 import json
 import os
-import glob
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-# --- Путь к Excel ---
+try:
+    import brotli
+except ImportError:  # без brotli пишем только .gz
+    brotli = None
+
+# Скрипт запускается из корня проекта: python data/convert_to_json.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from components.image_index import get_image_index, split_image_names
+from components.image_metadata import image_metadata_or_none, worker_count
+from components.catalog import load_catalog
+
+# --- Пути ---
 catalog_path = "data/catalog.xlsx"
+output_path = "data/catalog.json"
+manifest_path = "data/catalog.manifest.json"
+# Индекс для сетки, карточки товаров и шарды по брендам
+split_dir = "data/catalog"
+index_path = os.path.join(split_dir, "index.json")
+products_dir = os.path.join(split_dir, "products")
+brands_dir = os.path.join(split_dir, "brands")
+# Копии для Next.js фронтенда (раньше копировались вручную)
+mirror_dirs = ["data/frontend/public/data", "frontend/public/data"]
+
+# --- Сжатие ---
+# Файлы меньше этого размера не сжимаем (как gzip_min_length в nginx)
+COMPRESS_MIN_BYTES = 1024
+CHUNK_SIZE = 1024 * 1024
+# Формат файлов экспорта: при смене формата каталог переписывается целиком
+EXPORT_FORMAT = 3
+
+# --- Поиск фото (индекс дерева data/images строится один раз) ---
+image_index = get_image_index("data/images")
 
-# --- Читаем все листы и объединяем ---
-xls = pd.ExcelFile(catalog_path)
-df_list = []
-for sheet_name in xls.sheet_names:
-    sheet_df = pd.read_excel(xls, sheet_name=sheet_name)
-    sheet_df["brand_sheet"] = sheet_name
-    df_list.append(sheet_df)
-df = pd.concat(df_list, ignore_index=True)
-
-# --- Заполняем пустые ячейки сверху вниз ---
-for col in ["brand", "model", "gender", "color", "description"]:
-    if col in df.columns:
-        df[col].ffill(inplace=True)
-
-# --- Поиск фото ---
 def find_image(img_name):
     if not isinstance(img_name, str) or not img_name.strip():
         return None
     img_name = img_name.strip()
-    extensions = ["png", "jpg", "jpeg", "webp"]
-    for ext in extensions:
-        files = glob.glob(f"data/images/**/*{img_name}*.{ext}", recursive=True)
-        if files:
-            # относительный путь
-            return os.path.relpath(files[0], start="data").replace("\\", "/")
-    return None
-
-# --- Группировка по товарам ---
-grouped = df.groupby(["brand", "model", "gender", "color"], dropna=True)
-
-# --- Сбор каталога ---
-catalog = []
-
-for (brand, model, gender, color), group in grouped:
-    first_row = group.iloc[0]
-
-    # Собираем фото
-    images = []
-    if "image" in group.columns and pd.notna(first_row["image"]):
-        for img_name in str(first_row["image"]).split():
-            img_path = find_image(img_name)
-            if img_path:
-                images.append(f"data/{img_path}")
-
-    # Размеры
-    sizes_us = sorted(group["size US"].dropna().astype(str).unique()) if "size US" in group.columns else []
-    sizes_eu = sorted(group["size EU"].dropna().astype(str).unique()) if "size EU" in group.columns else []
-
-    # Наличие
-    stock = "yes" if any(str(x).lower() == "yes" for x in group.get("in stock", [])) else "no"
-
-    item = {
-        "brand": brand,
-        "model": model,
-        "gender": gender,
-        "color": color,
-        "price": float(first_row["price"]) if "price" in group.columns and pd.notna(first_row["price"]) else 0,
-        "description": str(first_row["description"]) if "description" in group.columns and pd.notna(first_row["description"]) else "",
-        "images": images,
-        "sizes": {
-            "US": sizes_us,
-            "EU": sizes_eu
-        },
-        "in_stock": stock
+    # Точное совпадение / по началу имени, затем по вхождению подстроки
+    return image_index.find(img_name) or image_index.find_containing(img_name)
+
+def export_path(path):
+    # относительный путь от корня проекта
+    return "data/" + os.path.relpath(path, start="data").replace("\\", "/")
+
+def resolve_images(df):
+    """Имя из колонки image → путь к файлу, для всех имен каталога сразу"""
+    names = set()
+    if "image" in df.columns:
+        for image_names in df["image"].dropna().unique():
+            names.update(split_image_names(image_names))
+    return {name: find_image(name) for name in names}
+
+# --- Хэш содержимого товара ---
+def content_hash(item):
+    canonical = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# --- Сбор каталога (по одному товару, без списка в памяти) ---
+def iter_catalog(df, resolved, metadata):
+    # Товар - (бренд, модель, цвет): тот же product_id, что у Streamlit и /api/products
+    grouped = df.groupby(["brand", "model_clean", "color"], dropna=True)
+
+    for _, group in grouped:
+        first_row = group.iloc[0]
+        brand, model, gender, color = (first_row[column] for column in ("brand", "model", "gender", "color"))
+
+        # Собираем фото
+        paths = []
+        if "image" in group.columns and pd.notna(first_row["image"]):
+            for img_name in str(first_row["image"]).split():
+                if resolved.get(img_name):
+                    paths.append(resolved[img_name])
+
+        # Размеры
+        sizes_us = sorted(group.loc[group["size US"] != "", "size US"].unique()) if "size US" in group.columns else []
+        sizes_eu = sorted(group.loc[group["size EU"] != "", "size EU"].unique()) if "size EU" in group.columns else []
+
+        # Наличие
+        stock = "yes" if any(str(x).lower() == "yes" for x in group.get("in stock", [])) else "no"
+
+        # Цены размеров: текст и пустые ячейки -> NaN, чтобы один товар не ронял экспорт
+        prices = pd.to_numeric(group["price"], errors="coerce") if "price" in group.columns else pd.Series(dtype=float)
+        first_price = prices.iloc[0] if len(prices) else None
+        # Минимальная цена по всем размерам (для индекса сетки)
+        prices = prices.dropna()
+
+        yield {
+            "id": first_row["product_id"],
+            "brand": brand,
+            "model": model,
+            "gender": gender,
+            "color": color,
+            "price": float(first_price) if pd.notna(first_price) else 0,
+            "description": str(first_row["description"]) if "description" in group.columns and pd.notna(first_row["description"]) else "",
+            "images": [export_path(path) for path in paths],
+            # Размеры, вес и хэш фото (считаются в пуле процессов)
+            "image_meta": [metadata[path].result() for path in paths],
+            "sizes": {
+                "US": sizes_us,
+                "EU": sizes_eu
+            },
+            "in_stock": stock,
+            "min_price": float(prices.min()) if len(prices) else None
+        }
+
+# --- Компактный JSON ---
+def dumps_compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+# --- Предсжатые копии .gz/.br рядом с файлом (отдаются сервером как есть) ---
+def compressed_paths(path):
+    return [f"{path}.gz"] + ([f"{path}.br"] if brotli is not None else [])
+
+def write_compressed(path):
+    if os.path.getsize(path) < COMPRESS_MIN_BYTES:
+        for compressed in compressed_paths(path):
+            if os.path.exists(compressed):
+                os.remove(compressed)
+        return
+    # mtime=0 - одинаковый файл дает одинаковый .gz
+    with open(path, "rb") as src, open(f"{path}.gz.tmp", "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    os.replace(f"{path}.gz.tmp", f"{path}.gz")
+    if brotli is not None:
+        compressor = brotli.Compressor(quality=11)
+        with open(path, "rb") as src, open(f"{path}.br.tmp", "wb") as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+        os.replace(f"{path}.br.tmp", f"{path}.br")
+
+def write_if_changed(path, text):
+    """Пишет файл (и сжатые копии), только если содержимое отличается"""
+    data = text.encode("utf-8")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+    write_compressed(path)
+    return True
+
+# --- Индекс, карточки товаров и шарды по брендам ---
+def product_path(item_id):
+    return os.path.join(products_dir, f"{item_id}.json")
+
+def brand_path(brand):
+    slug = "".join(ch if ch.isalnum() else "-" for ch in str(brand).lower()).strip("-")
+    return os.path.join(brands_dir, f"{slug or 'brand'}.json")
+
+def listing_entry(item):
+    """Легкая запись для сетки: полная карточка грузится при открытии товара"""
+    return {
+        "id": item["id"],
+        "brand": item["brand"],
+        "model": item["model"],
+        "color": item["color"],
+        "min_price": item["min_price"],
+        "thumbnail": item["images"][0] if item["images"] else None,
+        "in_stock": item["in_stock"],
     }
 
-    catalog.append(item)
+class SplitExport:
+    """Собирает индекс и шарды и пишет карточки изменившихся товаров по ходу экспорта"""
 
-# --- Сохраняем в JSON ---
-output_path = "data/catalog.json"
-os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    def __init__(self, previous_hashes, shards=False, force=False):
+        self.previous_hashes = previous_hashes
+        self.force = force
+        self.listing = []
+        self.brands = {} if shards else None
+        self.written = 0
+
+    def add(self, item, item_hash):
+        self.listing.append(listing_entry(item))
+        if self.brands is not None:
+            self.brands.setdefault(item["brand"], []).append(item)
+        path = product_path(item["id"])
+        if self.force or self.previous_hashes.get(item["id"]) != item_hash or not os.path.exists(path):
+            self.written += write_if_changed(path, dumps_compact(item))
+
+    def finish(self, hashes):
+        """Индекс, шарды и удаление карточек пропавших товаров"""
+        write_if_changed(index_path, dumps_compact(self.listing))
+        if self.brands is not None:
+            for brand, items in self.brands.items():
+                write_if_changed(brand_path(brand), dumps_compact(items))
+        if os.path.isdir(products_dir):
+            for name in os.listdir(products_dir):
+                if name.split(".")[0] not in hashes:
+                    os.remove(os.path.join(products_dir, name))
+
+# --- Потоковая запись компактного JSON ---
+def write_json_stream(items, path, split=None):
+    """Пишет товары по одному, возвращает {id товара: хэш содержимого}"""
+    hashes = {}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for item in items:
+            text = dumps_compact(item)
+            f.write(("," if hashes else "") + text)
+            item_hash = hashes[item["id"]] = content_hash(item)
+            if split is not None:
+                split.add(item, item_hash)
+        f.write("]")
+    return hashes
+
+# --- Манифест: версия каталога и хэши товаров (для загрузки только изменений) ---
+def read_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def catalog_version(hashes):
+    digest = hashlib.sha256(f"format:{EXPORT_FORMAT}\n".encode("utf-8"))
+    for item_id, item_hash in hashes.items():
+        digest.update(f"{item_id}:{item_hash}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def build_manifest(hashes, previous):
+    previous_hashes = (previous or {}).get("products", {})
+    return {
+        "version": catalog_version(hashes),
+        "revision": (previous or {}).get("revision", 0) + 1,
+        "previous_version": (previous or {}).get("version"),
+        "count": len(hashes),
+        "changed": [item_id for item_id, item_hash in hashes.items() if previous_hashes.get(item_id) != item_hash],
+        "removed": [item_id for item_id in previous_hashes if item_id not in hashes],
+        "products": hashes,
+    }
+
+# --- Копии для фронтенда: обновляем только отличающиеся файлы ---
+def export_files():
+    """Все файлы экспорта вместе со сжатыми копиями"""
+    paths = [output_path, manifest_path]
+    for root, _, names in os.walk(split_dir):
+        paths.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".json"))
+    return [
+        candidate for path in paths
+        for candidate in [path] + compressed_paths(path) if os.path.exists(candidate)
+    ]
+
+def sync_mirrors(paths, mirrors):
+    updated = []
+    relative = {os.path.relpath(path, "data") for path in paths}
+    for mirror in mirrors:
+        for path in paths:
+            target = os.path.join(mirror, os.path.relpath(path, "data"))
+            if os.path.exists(target) and filecmp.cmp(path, target, shallow=False):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+            updated.append(target)
+        # Карточки товаров, которых больше нет в каталоге
+        mirror_products = os.path.join(mirror, os.path.relpath(products_dir, "data"))
+        if os.path.isdir(mirror_products):
+            for name in os.listdir(mirror_products):
+                target = os.path.join(mirror_products, name)
+                if os.path.relpath(target, mirror) not in relative:
+                    os.remove(target)
+    return updated
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт каталога в JSON для фронтенда")
+    parser.add_argument("--force", action="store_true", help="перезаписать JSON, даже если товары не изменились")
+    parser.add_argument("--no-mirror", action="store_true", help="не копировать JSON в папки фронтенда")
+    parser.add_argument("--shards", action="store_true", help="дополнительно разбить каталог на файлы по брендам")
+    args = parser.parse_args()
+
+    # --- Нормализованный каталог из скомпилированного снимка (все листы) ---
+    df = load_catalog(catalog_path)
+
+    # --- Описание заполняем сверху вниз (остальные колонки уже заполнены) ---
+    if "description" in df.columns:
+        df["description"] = df["description"].replace("", pd.NA).ffill()
+
+    resolved = resolve_images(df)
+    image_paths = sorted({path for path in resolved.values() if path})
+
+    previous = read_manifest(manifest_path)
+    split = SplitExport((previous or {}).get("products", {}), shards=args.shards, force=args.force)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    # Метаданные всех фото считаются параллельно, пока товары пишутся по порядку
+    with ProcessPoolExecutor(max_workers=worker_count()) as pool:
+        metadata = {path: pool.submit(image_metadata_or_none, path) for path in image_paths}
+        hashes = write_json_stream(iter_catalog(df, resolved, metadata), tmp_path, split)
+    split.finish(hashes)
+
+    unchanged = (
+        not args.force and previous is not None and os.path.exists(output_path)
+        and previous.get("version") == catalog_version(hashes)
+    )
+    if unchanged:
+        # Файл не трогаем: фронтенд и CDN не скачивают каталог заново
+        os.remove(tmp_path)
+        manifest = previous
+        print(f"✅ Каталог не изменился (версия {manifest['version']}), {output_path} не перезаписан")
+    else:
+        # Подменяем файл целиком, чтобы фронтенд не прочитал недописанный
+        os.replace(tmp_path, output_path)
+        write_compressed(output_path)
+        manifest = build_manifest(hashes, previous)
+        write_if_changed(manifest_path, dumps_compact(manifest))
+        print(f"✅ Готово! Каталог сохранён в {output_path} (версия {manifest['version']})")
+        print(f"🔁 Изменено товаров: {len(manifest['changed'])}, удалено: {len(manifest['removed'])}")
+    print(f"🗂️ Карточек товаров записано: {split.written}, индекс: {index_path}")
+
+    if not args.no_mirror:
+        updated = sync_mirrors(export_files(), mirror_dirs)
+        print(f"📁 Копии для фронтенда: обновлено файлов {len(updated)} в {', '.join(mirror_dirs)}")
 
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(catalog, f, ensure_ascii=False, indent=2)
+    print(f"📦 Всего товаров: {manifest['count']}")
 
-print(f"✅ Готово! Каталог сохранён в {output_path}")
-print(f"📦 Всего товаров: {len(catalog)}")
+if __name__ == "__main__":
+    main()
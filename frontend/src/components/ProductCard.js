@@ -1,17 +1,24 @@
 export default function ProductCard({ product, onClick }) {
+  const name = `${product.brand} ${product.model}`;
   return (
     <div
       onClick={onClick}
       className="bg-white rounded-2xl shadow hover:shadow-lg cursor-pointer transition p-4 flex flex-col"
     >
       <img
-        src={product.image || "/no-image.png"}
-        alt={product.name}
+        src={product.thumbnail ? `/${product.thumbnail}` : "/no_image.jpg"}
+        alt={name}
+        loading="lazy"
         className="w-full h-48 object-cover rounded-xl"
       />
-      <h3 className="text-lg font-semibold mt-3">{product.name}</h3>
-      <p className="text-gray-500">{product.description}</p>
-      <span className="mt-auto text-blue-600 font-medium">{product.status}</span>
+      <h3 className="text-lg font-semibold mt-3">{name}</h3>
+      <p className="text-gray-500">{product.color}</p>
+      {product.min_price != null && (
+        <p className="text-gray-700">от {Math.round(product.min_price / 1000) * 1000} ₸</p>
+      )}
+      <span className="mt-auto text-blue-600 font-medium">
+        {product.in_stock === "yes" ? "В наличии" : "Нет в наличии"}
+      </span>
     </div>
   );
 }
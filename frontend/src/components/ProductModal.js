@@ -1,4 +1,27 @@
+import { useState, useEffect } from "react";
+
 export default function ProductModal({ product, onClose }) {
+  // Полная карточка товара (описание, размеры, фото) из products/<id>.json
+  const [details, setDetails] = useState(null);
+
+  useEffect(() => {
+    if (product.details) {
+      // Товар из общего catalog.json - карточка уже полная
+      setDetails(product.details);
+      return;
+    }
+    setDetails(null);
+    fetch(`/data/catalog/products/${product.id}.json`)
+      .then((res) => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        return res.json();
+      })
+      .then((data) => setDetails(data))
+      .catch((err) => console.error("Ошибка загрузки товара:", err));
+  }, [product.id, product.details]);
+
+  const name = `${product.brand} ${product.model}`;
+  const image = details?.images?.[0] || product.thumbnail;
   return (
     <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center z-50">
       <div className="bg-white p-6 rounded-2xl shadow-lg max-w-md w-full relative">
@@ -9,14 +32,22 @@ export default function ProductModal({ product, onClose }) {
           ✕
         </button>
         <img
-          src={product.image || "/no-image.png"}
-          alt={product.name}
+          src={image ? `/${image}` : "/no_image.jpg"}
+          alt={name}
           className="w-full h-60 object-cover rounded-xl"
         />
-        <h2 className="text-2xl font-bold mt-4">{product.name}</h2>
-        <p className="text-gray-600 mt-2">{product.description}</p>
-        <p className="text-sm text-gray-500 mt-1">Размеры: {product.sizes}</p>
-        <p className="text-blue-600 font-medium mt-3">Статус: {product.status}</p>
+        <h2 className="text-2xl font-bold mt-4">{name}</h2>
+        {details ? (
+          <>
+            <p className="text-gray-600 mt-2">{details.description}</p>
+            <p className="text-sm text-gray-500 mt-1">Размеры (EU): {(details.sizes?.EU || []).join(", ")}</p>
+          </>
+        ) : (
+          <p className="text-gray-400 mt-2">Загрузка...</p>
+        )}
+        <p className="text-blue-600 font-medium mt-3">
+          Статус: {product.in_stock === "yes" ? "В наличии" : "Нет в наличии"}
+        </p>
       </div>
     </div>
   );
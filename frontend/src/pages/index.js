@@ -3,13 +3,37 @@ import Banner from "@/components/Banner";
 import ProductCard from "@/components/ProductCard";
 import ProductModal from "@/components/ProductModal";
 
+// Запись сетки из полного catalog.json (до первого экспорта data/catalog/ нет)
+function listingEntry(item, index) {
+  return {
+    id: item.id || `${item.brand}|${item.model}|${item.color}|${index}`,
+    brand: item.brand,
+    model: item.model,
+    color: item.color,
+    min_price: item.min_price ?? item.price,
+    thumbnail: item.images?.[0],
+    in_stock: item.in_stock,
+    // Полная карточка уже есть - модальное окно не будет ее загружать
+    details: item,
+  };
+}
+
+function fetchJson(url) {
+  return fetch(url).then((res) => {
+    if (!res.ok) throw new Error(`${url}: HTTP ${res.status}`);
+    return res.json();
+  });
+}
+
 export default function Home() {
   const [catalog, setCatalog] = useState([]);
   const [selectedProduct, setSelectedProduct] = useState(null);
 
   useEffect(() => {
-    fetch("/data/catalog.json")
-      .then((res) => res.json())
+    // Легкий индекс для сетки; полная карточка грузится при открытии товара.
+    // Если экспорт еще не запускали, берем общий catalog.json
+    fetchJson("/data/catalog/index.json")
+      .catch(() => fetchJson("/data/catalog.json").then((items) => items.map(listingEntry)))
       .then((data) => setCatalog(data))
       .catch((err) => console.error("Ошибка загрузки JSON:", err));
   }, []);
@@ -18,8 +42,8 @@ export default function Home() {
     <div className="min-h-screen bg-gray-100">
       <Banner />
       <div className="container mx-auto px-4 py-6 grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
-        {catalog.map((item, index) => (
-          <ProductCard key={index} product={item} onClick={() => setSelectedProduct(item)} />
+        {catalog.map((item) => (
+          <ProductCard key={item.id} product={item} onClick={() => setSelectedProduct(item)} />
         ))}
       </div>
 
@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
-import glob
 import os
-import re
-import base64
+from components.catalog_store import get_catalog
+from components.variants import round_price
+from components.image_index import get_image_path, get_image_paths
+from components.static_images import original_src
 
 # --- Настройки страницы ---
 st.set_page_config(page_title="Детали товара - DENE Store", layout="wide")
@@ -57,161 +57,17 @@ st.markdown("""
 # --- Пути ---
 CATALOG_PATH = "data/catalog.xlsx"
 IMAGES_PATH = "data/images"
+# Ширина галереи (CSS px), делится между фото - по ней выбирается вариант
+GALLERY_WIDTH = 1200
 
-# --- Функция округления цены ---
-def round_price(price):
-    """Округляет цену до тысяч"""
+# --- Загрузка данных (общая с главной страницей версия каталога) ---
+def find_product(product_id):
+    """Варианты модели и цвет товара по product_id или (None, None)"""
     try:
-        return round(float(price) / 1000) * 1000
-    except:
-        return price
-
-# --- Функции для изображений ---
-def get_image_path(image_names):
-    """Ищет изображение по имени из колонки image"""
-    if (image_names is pd.NA or 
-        pd.isna(image_names) or 
-        not image_names or 
-        str(image_names).strip() == ""):
-        fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
-        return fallback
-    
-    image_names_list = str(image_names).strip().split()
-    if not image_names_list:
-        fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
-        return fallback
-    
-    first_image_name = image_names_list[0]
-    
-    # Сначала ищем точное совпадение
-    for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-        pattern = os.path.join(IMAGES_PATH, "**", f"{first_image_name}{ext}")
-        image_files = glob.glob(pattern, recursive=True)
-        if image_files:
-            return image_files[0]
-    
-    # Затем ищем частичное совпадение (начинается с)
-    for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-        pattern_start = os.path.join(IMAGES_PATH, "**", f"{first_image_name}*{ext}")
-        image_files = glob.glob(pattern_start, recursive=True)
-        if image_files:
-            return image_files[0]
-    
-    # Если ничего не нашли, используем fallback
-    fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
-    return fallback
-
-def get_image_base64(image_path):
-    """Возвращает изображение в base64 для вставки в HTML"""
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode("utf-8")
-    except Exception:
-        fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
-        with open(fallback, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode("utf-8")
-
-# --- Функция для получения EU размеров ИЗ КАТАЛОГА ---
-def get_eu_size_from_catalog(us_size, brand, model_clean, color, df):
-    """Ищет EU размер в каталоге, если не находит - использует конверсию"""
-    if not us_size or us_size == "" or us_size == "nan":
-        return ""
-    
-    us_size_clean = str(us_size).strip()
-    
-    # Сначала ищем в каталоге точное совпадение
-    catalog_entry = df[
-        (df["brand"] == brand) & 
-        (df["model_clean"] == model_clean) & 
-        (df["color"] == color) & 
-        (df["size US"] == us_size_clean)
-    ]
-    
-    if not catalog_entry.empty and 'size EU' in catalog_entry.columns:
-        eu_size = catalog_entry.iloc[0]['size EU']
-        if pd.notna(eu_size) and str(eu_size).strip() != "":
-            eu_size_str = str(eu_size).strip()
-            # Убираем .0 для целых чисел в EU размере
-            if eu_size_str.endswith('.0'):
-                eu_size_str = eu_size_str[:-2]
-            return eu_size_str
-    
-    # Если в каталоге не нашли, используем нашу таблицу конверсии
-    return get_eu_size_fallback(us_size_clean)
-
-# --- Фолбэк таблица конверсии размеров US ↔ EU ---
-def get_eu_size_fallback(us_size):
-    """Конвертирует US размер в EU размер (используется если в каталоге нет данных)"""
-    size_conversion = {
-        "1": "34", "2": "35", "3": "36", "4": "37", "5": "38",
-        "6": "39", "7": "40", "8": "41", "9": "42", "10": "43",
-        "11": "44", "12": "45", "13": "46",
-        "3.5": "35.5", "4": "37", "4.5": "36.5", "5": "37.5", 
-        "5.5": "38", "6": "38.5", "6.5": "39", "7": "40", 
-        "7.5": "40.5", "8": "41", "8.5": "42", "9": "42.5", 
-        "9.5": "43", "10": "44", "10.5": "44.5", "11": "44.5"
-    }
-    
-    us_size_clean = str(us_size).strip()
-    
-    # Убираем .0 для целых чисел
-    if us_size_clean.endswith('.0'):
-        us_size_clean = us_size_clean[:-2]
-    
-    # Ищем точное совпадение
-    if us_size_clean in size_conversion:
-        eu_size = size_conversion[us_size_clean]
-        return eu_size
-    
-    # Если не нашли, возвращаем пустую строку
-    return ""
-
-# --- Загрузка данных (согласованная с главной страницей) ---
-@st.cache_data(show_spinner=False)
-def load_data():
-    try:
-        # Читаем все листы Excel файла
-        all_sheets = pd.read_excel(CATALOG_PATH, sheet_name=None)
-        
-        # Обрабатываем каждый лист и объединяем
-        processed_dfs = []
-        
-        for sheet_name, sheet_data in all_sheets.items():
-            # Заполняем пропущенные значения в ключевых колонках
-            sheet_data = sheet_data.fillna("")
-            
-            # Заполняем данные для бренда и модели
-            sheet_data['brand'] = sheet_data['brand'].replace('', pd.NA).ffill()
-            sheet_data['model'] = sheet_data['model'].replace('', pd.NA).ffill()
-            sheet_data['gender'] = sheet_data['gender'].replace('', pd.NA).ffill()
-            
-            # Для цвета используем заполнение, но не для изображений
-            sheet_data['color'] = sheet_data['color'].replace('', pd.NA).ffill()
-            
-            # Изображения оставляем как есть - не заполняем!
-            sheet_data['image'] = sheet_data['image'].replace('', pd.NA)
-            
-            # Преобразуем размеры в строки и убираем лишние пробелы
-            sheet_data['size US'] = sheet_data['size US'].astype(str).str.strip()
-            
-            # Очищаем название модели (убираем артикулы в скобках)
-            sheet_data["model_clean"] = sheet_data["model"].apply(
-                lambda x: re.sub(r'\([^)]*\)', '', str(x)).strip() if pd.notna(x) else ""
-            )
-            
-            processed_dfs.append(sheet_data)
-        
-        # Объединяем все листы
-        df = pd.concat(processed_dfs, ignore_index=True)
-        
-        # Убираем строки без модели или бренда
-        df = df[(df['brand'] != '') & (df['model_clean'] != '')]
-        
-        return df
-        
+        return get_catalog(CATALOG_PATH).find_product(product_id)
     except Exception as e:
         st.error(f"Ошибка загрузки данных: {e}")
-        return pd.DataFrame()
+        return None, None
 
 # --- Функция для добавления в корзину ---
 def add_to_cart(product_data, selected_size=None, selected_price=None):
@@ -247,93 +103,31 @@ def main():
         if st.button(cart_text, use_container_width=True):
             st.switch_page("pages/3_Корзина.py")
 
-    # Проверяем, есть ли выбранный товар
-    if "product_data" not in st.session_state:
+    # Товар: из кнопки "Подробнее" в каталоге или из адреса страницы (?product=<id>)
+    product_id = st.session_state.pop("open_product", None) or st.query_params.get("product")
+    if not product_id:
         st.error("Товар не найден. Вернитесь в каталог и выберите товар.")
         return
+    # Ключ в адресе: страницу товара можно обновить, сохранить или отправить ссылкой
+    st.query_params["product"] = product_id
 
-    product_data = st.session_state.product_data
-    df = load_data()
-
-    # Получаем все варианты той же модели и цвета
-    same_model_color_df = df[
-        (df["model_clean"] == product_data["model_clean"]) & 
-        (df["brand"] == product_data["brand"]) &
-        (df["color"] == product_data["color"])
-    ]
-
-    if same_model_color_df.empty:
+    # Модель со всеми цветами и текущий цвет
+    variants, current_color = find_product(product_id)
+    if variants is None:
         st.error("Данные о товаре не найдены в каталоге")
         return
 
-    # Получаем ВСЕ размеры для этого цвета с их ценами и наличием
-    available_sizes = []
-    for _, row in same_model_color_df.iterrows():
-        us_size = str(row['size US']).strip()
-        # Проверяем наличие товара (in stock)
-        in_stock = str(row.get('in stock', 'yes')).strip().lower() if pd.notna(row.get('in stock')) else 'yes'
-        
-        # ПОКАЗЫВАЕМ ВСЕ РАЗМЕРЫ В НАЛИЧИИ (не только 5-11)
-        if us_size and us_size != "nan" and in_stock == 'yes':
-            # ОКРУГЛЯЕМ ЦЕНУ ДО ТЫСЯЧ
-            rounded_price = round_price(row['price'])
-            
-            available_sizes.append({
-                'us_size': us_size,
-                'eu_size': get_eu_size_from_catalog(us_size, product_data["brand"], 
-                                                   product_data["model_clean"], 
-                                                   product_data["color"], df),
-                'price': rounded_price,
-                'in_stock': in_stock
-            })
-
-    # Сортируем размеры
-    sorted_sizes = sorted(available_sizes, key=lambda x: float(x['us_size']) if x['us_size'].replace('.', '').isdigit() else x['us_size'])
-
-    # Получаем все цвета этой модели для переключения (только те, у которых есть размеры в наличии)
-    all_colors_df = df[
-        (df["model_clean"] == product_data["model_clean"]) & 
-        (df["brand"] == product_data["brand"])
-    ]
-    
-    # Фильтруем цвета: оставляем только те, у которых есть хотя бы один размер в наличии
-    colors_with_stock = []
-    for color in all_colors_df['color'].unique():
-        color_sizes = df[
-            (df["model_clean"] == product_data["model_clean"]) & 
-            (df["brand"] == product_data["brand"]) &
-            (df["color"] == color)
-        ]
-        # Проверяем есть ли размеры в наличии для этого цвета
-        has_stock = any(
-            str(row.get('in stock', 'yes')).strip().lower() == 'yes' 
-            for _, row in color_sizes.iterrows() 
-            if str(row['size US']).strip() and str(row['size US']).strip() != "nan"
-        )
-        if has_stock:
-            colors_with_stock.append(color)
-    
-    unique_colors = all_colors_df[all_colors_df['color'].isin(colors_with_stock)].groupby('color').first().reset_index()
-
-    # Текущий выбранный цвет
-    current_color = product_data["color"]
-    current_color_data = unique_colors[unique_colors["color"] == current_color].iloc[0]
+    # Все размеры в наличии для этого цвета с ценами (уже отсортированы)
+    current_variant = variants['colors'][current_color]
+    current_color_data = current_variant['record']
+    sorted_sizes = current_variant['sizes']
 
     # Заголовок
     st.markdown(f"<h1 style='margin-bottom: 10px;'>{current_color_data['brand']} {current_color_data['model_clean']}</h1>", unsafe_allow_html=True)
     st.markdown(f"<h3 style='color: #666; margin-bottom: 30px;'>Цвет: {current_color.capitalize()}</h3>", unsafe_allow_html=True)
 
     # --- Горизонтальная галерея изображений ---
-    all_images = []
-    if current_color_data["image"]:
-        image_names_list = str(current_color_data["image"]).strip().split()
-        for img_name in image_names_list:
-            for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                pattern = os.path.join(IMAGES_PATH, "**", f"{img_name}*{ext}")
-                files = glob.glob(pattern, recursive=True)
-                all_images.extend(files)
-
-    all_images = list(dict.fromkeys(all_images))
+    all_images = get_image_paths(current_color_data["image"])
     if not all_images:
         all_images = [os.path.join(IMAGES_PATH, "no_image.jpg")]
 
@@ -342,9 +136,8 @@ def main():
         cols = st.columns(len(all_images))
         for idx, (col, img_path) in enumerate(zip(cols, all_images)):
             with col:
-                image_base64 = get_image_base64(img_path)
                 st.markdown(
-                    f'<img src="data:image/jpeg;base64,{image_base64}" '
+                    f'<img src="{original_src(img_path, display_size=(GALLERY_WIDTH // len(all_images), None))}" '
                     f'style="width:100%; border-radius:12px; border:1px solid #eee;">',
                     unsafe_allow_html=True
                 )
@@ -368,14 +161,16 @@ def main():
         with info_col2:
             st.markdown(f"**Пол:** {current_color_data['gender']}")
             # Показываем диапазон цен если есть разные цены
-            if sorted_sizes:
-                prices = [size['price'] for size in sorted_sizes]
+            prices = [size['price'] for size in sorted_sizes if size['price'] is not None]
+            if prices:
                 min_price = min(prices)
                 max_price = max(prices)
                 if min_price == max_price:
                     st.markdown(f"**Цена:** {int(min_price):,} ₸".replace(",", " "))
                 else:
                     st.markdown(f"**Цена:** {int(min_price):,} - {int(max_price):,} ₸".replace(",", " "))
+            elif sorted_sizes:
+                st.markdown("**Цена уточняется**")
             else:
                 st.markdown("**Нет в наличии**")
         
@@ -414,10 +209,11 @@ def main():
                 is_selected = selected_size == us_size
                 
                 # ЭЛЕГАНТНЫЙ ФОРМАТ: US 7 / EU 40 - 45 000 ₸
+                price_text = f"{int(price):,} ₸".replace(",", " ") if price is not None else "цена уточняется"
                 if eu_size:
-                    button_text = f"US {us_size_display} / EU {eu_size} - {int(price):,} ₸".replace(",", " ")
+                    button_text = f"US {us_size_display} / EU {eu_size} - {price_text}"
                 else:
-                    button_text = f"US {us_size_display} - {int(price):,} ₸".replace(",", " ")
+                    button_text = f"US {us_size_display} - {price_text}"
                 
                 if st.button(button_text, 
                             key=f"size_{us_size}",
@@ -430,7 +226,10 @@ def main():
             st.markdown("<br>", unsafe_allow_html=True)
             
             # Кнопка добавления в корзину
-            if st.session_state.selected_size:
+            if st.session_state.selected_size and st.session_state.selected_price is None:
+                # Без цены товар в корзину не кладем
+                st.button("Цена уточняется", disabled=True, use_container_width=True)
+            elif st.session_state.selected_size:
                 selected_price = st.session_state.selected_price
                 button_text = f"Добавить в корзину - {int(selected_price):,} ₸".replace(",", " ")
                 if st.button(button_text, type="primary", use_container_width=True):
@@ -442,51 +241,39 @@ def main():
             st.warning("Нет размеров в наличии")
             st.info("Выберите другой цвет или проверьте позже")
 
-        # --- Другие цвета этой модели ---
-        other_colors = unique_colors[unique_colors["color"] != current_color]
-        if not other_colors.empty:
+        # --- Другие цвета этой модели (только цвета с размерами в наличии) ---
+        other_colors = [color for color in variants['stocked_colors'] if color != current_color]
+        if other_colors:
             st.markdown("### Другие цвета")
             
             # Сетка цветов 2 колонки
             color_cols = st.columns(2)
-            for idx, (_, variant) in enumerate(other_colors.iterrows()):
+            for idx, color in enumerate(other_colors):
                 with color_cols[idx % 2]:
+                    variant = variants['colors'][color]['record']
                     # Показываем уменьшенное изображение для цвета
                     img_path = get_image_path(variant["image"])
                     
-                    # Получаем минимальную цену для этого цвета (только размеры в наличии)
-                    color_sizes = df[
-                        (df["model_clean"] == variant["model_clean"]) & 
-                        (df["brand"] == variant["brand"]) &
-                        (df["color"] == variant["color"])
-                    ]
-                    # Фильтруем только размеры в наличии
-                    available_color_sizes = [
-                        row for _, row in color_sizes.iterrows()
-                        if str(row.get('in stock', 'yes')).strip().lower() == 'yes'
-                        and str(row['size US']).strip() and str(row['size US']).strip() != "nan"
-                    ]
+                    # Минимальная цена для этого цвета (только размеры в наличии, округлена до тысяч)
+                    min_color_price = variants['colors'][color]['min_price']
                     
-                    if available_color_sizes:
-                        # ОКРУГЛЯЕМ ЦЕНУ ДО ТЫСЯЧ
-                        min_color_price = min(round_price(row['price']) for row in available_color_sizes)
-                        
-                        # Используем встроенный Streamlit image вместо HTML
-                        try:
-                            st.image(img_path, use_container_width=True, caption=f"{variant['color'].capitalize()}")
-                        except Exception as e:
-                            st.error(f"Ошибка загрузки изображения: {e}")
-                            fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
-                            st.image(fallback, use_container_width=True, caption=f"{variant['color'].capitalize()}")
-                        
+                    # Используем встроенный Streamlit image вместо HTML
+                    try:
+                        st.image(img_path, use_container_width=True, caption=f"{variant['color'].capitalize()}")
+                    except Exception as e:
+                        st.error(f"Ошибка загрузки изображения: {e}")
+                        fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
+                        st.image(fallback, use_container_width=True, caption=f"{variant['color'].capitalize()}")
+                    
+                    if min_color_price is not None:
                         st.markdown(f"**от {int(min_color_price):,} ₸**".replace(",", " "))
-                        
-                        # Кнопка переключения на этот цвет
-                        if st.button(f"Выбрать", key=f"color_{variant['color']}", use_container_width=True):
-                            st.session_state.selected_size = None  # Сбрасываем выбранный размер
-                            st.session_state.selected_price = None
-                            st.session_state.product_data = dict(variant)
-                            st.rerun()
+                    
+                    # Кнопка переключения на этот цвет
+                    if st.button(f"Выбрать", key=f"color_{variant['color']}", use_container_width=True):
+                        st.session_state.selected_size = None  # Сбрасываем выбранный размер
+                        st.session_state.selected_price = None
+                        st.query_params["product"] = variant['product_id']
+                        st.rerun()
 
     # --- Информация о доставке и возврате ---
     st.markdown("---")
@@ -1,110 +1,21 @@
 import streamlit as st
-import glob
 import os
-import base64
-import requests
-import json
+from components.image_index import get_image_path
+from components.static_images import original_src
+from components.order_service import place_order
 
 st.set_page_config(page_title="Корзина - DENE Store", layout="wide")
 
 # Пути
 IMAGES_PATH = "data/images"
+# Фото в корзине не шире 150px - хватает самого маленького варианта
+CART_IMAGE_SIZE = (150, None)
 
 # --- Безопасные настройки Telegram бота через переменные окружения ---
 import os
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
 
-# --- Функции для изображений ---
-def get_image_path(image_names, images_path="data/images"):
-    """Ищет изображение по имени из колонки image"""
-    if (image_names is None or 
-        not image_names or 
-        str(image_names).strip() == "" or
-        str(image_names).lower() == "nan"):
-        return os.path.join(images_path, "no_image.jpg")
-    
-    image_names_list = str(image_names).strip().split()
-    if not image_names_list:
-        return os.path.join(images_path, "no_image.jpg")
-    
-    first_image_name = image_names_list[0]
-    
-    for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-        pattern = os.path.join(images_path, "**", f"{first_image_name}{ext}")
-        image_files = glob.glob(pattern, recursive=True)
-        if image_files:
-            return image_files[0]
-        
-        pattern_start = os.path.join(images_path, "**", f"{first_image_name}*{ext}")
-        image_files = glob.glob(pattern_start, recursive=True)
-        if image_files:
-            return image_files[0]
-    
-    return os.path.join(images_path, "no_image.jpg")
-
-def get_image_base64(image_path):
-    """Возвращает изображение в base64 для вставки в HTML"""
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode("utf-8")
-    except Exception:
-        fallback = os.path.join(IMAGES_PATH, "no_image.jpg")
-        try:
-            with open(fallback, "rb") as img_file:
-                return base64.b64encode(img_file.read()).decode("utf-8")
-        except:
-            return ""
-
-# --- Функция для отправки заказа в Telegram ---
-def send_order_to_telegram(order_data):
-    """Отправляет заказ в Telegram"""
-    try:
-        # Проверяем настройки Telegram
-        if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-            st.error("Telegram бот не настроен. Пожалуйста, проверьте настройки переменных окружения.")
-            return False
-        
-        # Формируем сообщение
-        message = f"НОВЫЙ ЗАКАЗ\n\n"
-        message += f"Клиент: {order_data['customer_name']}\n"
-        message += f"Телефон: {order_data['customer_phone']}\n"
-        message += f"Адрес: {order_data['customer_address']}\n"
-        
-        if order_data.get('customer_email'):
-            message += f"Email: {order_data['customer_email']}\n"
-        
-        if order_data.get('customer_comment'):
-            message += f"Комментарий: {order_data['customer_comment']}\n"
-        
-        message += f"\nТовары:\n"
-        
-        total = 0
-        for i, item in enumerate(order_data['items'], 1):
-            item_total = item['price'] * item['quantity']
-            total += item_total
-            message += f"{i}. {item['brand']} {item['model']}\n"
-            message += f"   Цвет: {item['color']}\n"
-            message += f"   Размер: {item['size']}\n"
-            message += f"   Цена: {item['price']:,} ₸ x {item['quantity']} = {item_total:,} ₸\n\n"
-        
-        message += f"ИТОГО: {total:,} ₸".replace(",", " ")
-        
-        # Отправляем в Telegram
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": message,
-            "parse_mode": "Markdown"
-        }
-        
-        response = requests.post(url, json=payload)
-        return response.status_code == 200
-        
-    except Exception as e:
-        st.error(f"Ошибка отправки заказа: {e}")
-        return False
-
 # --- Функция для форматирования цены ---
 def format_price(price):
     """Округляет цену до тысяч и форматирует с разделителями"""
@@ -138,6 +49,12 @@ def update_quantity(index, new_quantity):
         st.session_state.cart[index]['quantity'] = new_quantity
     st.rerun()
 
+# Заказ оформлен на прошлом запуске страницы
+if st.session_state.get('last_order_id'):
+    st.success(f"Заказ №{st.session_state.last_order_id} успешно оформлен! Мы свяжемся с вами в ближайшее время.")
+    st.balloons()
+    del st.session_state['last_order_id']
+
 # Отображение товаров в корзине
 if not st.session_state.cart:
     st.info("Ваша корзина пуста")
@@ -152,10 +69,10 @@ else:
             if 'image' in item and item['image']:
                 try:
                     image_path = get_image_path(item['image'])
-                    image_base64 = get_image_base64(image_path)
-                    if image_base64:
+                    image_src = original_src(image_path, display_size=CART_IMAGE_SIZE)
+                    if image_src:
                         st.markdown(
-                            f'<img src="data:image/jpeg;base64,{image_base64}" style="width:100%; border-radius:8px; max-width:150px;">',
+                            f'<img src="{image_src}" style="width:100%; border-radius:8px; max-width:150px;">',
                             unsafe_allow_html=True
                         )
                     else:
@@ -271,20 +188,19 @@ if st.session_state.get('show_order_form', False):
                     'total': total
                 }
                 
-                # Отправляем заказ в Telegram
-                with st.spinner("Отправляем заказ..."):
-                    success = send_order_to_telegram(order_data)
-                
-                if success:
-                    st.success("Заказ успешно оформлен! Мы свяжемся с вами в ближайшее время.")
-                    st.balloons()
-                    
+                # Сохраняем заказ в очередь (без ожидания Telegram);
+                # в Telegram и в хранилище заказов он уходит из фоновых потоков
+                try:
+                    order_id = place_order(order_data)
+                except Exception as e:
+                    st.error(f"Ошибка оформления заказа: {e}")
+                else:
+                    st.session_state.last_order_id = order_id
+
                     # Очищаем корзину после успешного оформления
                     st.session_state.cart = []
                     st.session_state.show_order_form = False
                     st.rerun()
-                else:
-                    st.error("Произошла ошибка при отправке заказа. Пожалуйста, попробуйте еще раз или свяжитесь с нами напрямую.")
 
 # --- ФУТЕР ---
 from components.documents import documents_footer
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Тесты запускаются из корня репозитория: components импортируется как пакет
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from components.catalog import read_snapshot, write_snapshot
+
+pytest.importorskip("pyarrow")
+
+
+def _values(series):
+    # repr различает 100001, 100001.0 и "100001"
+    return [repr(value) for value in series]
+
+
+def test_round_trip_keeps_value_types(tmp_path):
+    df = pd.DataFrame({
+        'sku': [100001, 100002, "", 100003],
+        'article': [100001, "AB-7", "", 2.5],
+        'price': [72000, 72500.5, "", 70000],
+        'image': ["af1", pd.NA, "dunk", pd.NA],
+        'brand': ["Nike", "Nike", "Puma", "Puma"],
+    })
+    path = str(tmp_path / "catalog.arrow")
+    write_snapshot(df, path, {})
+    restored = read_snapshot(path)
+
+    assert list(restored.columns) == list(df.columns)
+    for column in df.columns:
+        assert _values(restored[column]) == _values(df[column]), column
@@ -0,0 +1,76 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+from components.catalog import finalize_catalog, normalize_sheet, product_id
+from components.image_index import ImageIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def convert():
+    # data/ не пакет: скрипт экспорта грузим по пути
+    spec = importlib.util.spec_from_file_location("convert_to_json", os.path.join(ROOT, "data", "convert_to_json.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _rows(*rows):
+    columns = ["brand", "model", "model_clean", "gender", "color", "price", "size US", "size EU", "product_id"]
+    return pd.DataFrame([dict(zip(columns, row)) for row in rows])
+
+
+def test_non_numeric_price_does_not_stop_export(convert):
+    df = _rows(
+        ("Nike", "Air Max", "Air Max", "men", "black", "по запросу", "8", "41", "a1"),
+        ("Nike", "Air Max", "Air Max", "men", "black", 55000, "9", "42", "a1"),
+        ("Puma", "Suede", "Suede", "men", "red", "", "7", "40", "b1"),
+    )
+    items = {item["id"]: item for item in convert.iter_catalog(df, {}, {})}
+
+    assert (items["a1"]["price"], items["a1"]["min_price"]) == (0, 55000.0)
+    assert (items["b1"]["price"], items["b1"]["min_price"]) == (0, None)
+
+
+def test_groups_rows_by_product_key(convert):
+    # Артикул в скобках и пол не делят товар: ключ - (бренд, модель без артикула, цвет)
+    sheet = pd.DataFrame({
+        "brand": ["Nike", "", "", "Nike"],
+        "model": ["Air Force 1 (CW2288)", "", "Air Force 1", "Air Force 1"],
+        "gender": ["men", "", "women", "men"],
+        "color": ["white", "", "white", "black"],
+        "image": ["af1", "", "", "af1-black"],
+        "size US": ["8", "9", "6", "8"],
+        "size EU": ["41", "42", "38", "41"],
+        "price": [72000, 72000, 70000, 72000],
+        "in stock": ["yes", "no", "yes", "no"],
+    })
+    df = finalize_catalog([normalize_sheet(sheet, "Nike")])
+    items = list(convert.iter_catalog(df, {}, {}))
+
+    assert [item["id"] for item in items] == [
+        product_id("Nike", "Air Force 1", "black"),
+        product_id("Nike", "Air Force 1", "white"),
+    ]
+    white = items[1]
+    assert white["model"] == "Air Force 1 (CW2288)"
+    assert white["sizes"] == {"US": ["6", "8", "9"], "EU": ["38", "41", "42"]}
+    assert (white["in_stock"], white["min_price"]) == ("yes", 70000.0)
+
+
+def test_find_image_prefers_exact_name(convert, tmp_path, monkeypatch):
+    for name in ("af1-side.jpg", "af1.png", "white-af1.jpg", "dunk.jpg"):
+        (tmp_path / name).write_bytes(b"")
+    monkeypatch.setattr(convert, "image_index", ImageIndex(str(tmp_path)))
+
+    # Точное имя важнее расширения; затем по началу имени, затем по вхождению
+    assert convert.find_image("af1") == str(tmp_path / "af1.png")
+    assert convert.find_image("af1-s") == str(tmp_path / "af1-side.jpg")
+    assert convert.find_image("white") == str(tmp_path / "white-af1.jpg")
+    assert convert.find_image("side") == str(tmp_path / "af1-side.jpg")
+    assert convert.find_image("air max") is None
+    assert convert.find_image("  ") is None
@@ -0,0 +1,31 @@
+import os
+
+from PIL import Image
+
+from components.image_variants import build_variants
+
+
+def _variant_paths(manifest, output_dir):
+    return [os.path.join(output_dir, variant['file'])
+            for entry in manifest['images'].values() for variant in entry['variants']]
+
+
+def test_force_reencodes_existing_variants(tmp_path):
+    images_dir = tmp_path / "images"
+    output_dir = tmp_path / "variants"
+    images_dir.mkdir()
+    Image.new('RGB', (300, 200), (200, 30, 30)).save(images_dir / "shoe.jpg")
+
+    manifest, rebuilt = build_variants(str(images_dir), str(output_dir), workers=1)
+    paths = _variant_paths(manifest, str(output_dir))
+    assert rebuilt == 1 and paths
+
+    # Испорченный вариант с тем же именем (имя зависит только от исходника)
+    with open(paths[0], "wb") as f:
+        f.write(b"broken")
+
+    manifest, rebuilt = build_variants(str(images_dir), str(output_dir), force=True, workers=1)
+    assert _variant_paths(manifest, str(output_dir)) == paths
+    for path in paths:
+        with Image.open(path) as img:
+            img.verify()
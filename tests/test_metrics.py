@@ -0,0 +1,28 @@
+import pytest
+from PIL import Image
+
+from components import image_cache, metrics
+from components.image_cache import ThumbnailCache
+
+
+def test_family_requires_new_series():
+    with pytest.raises(TypeError):
+        metrics._Family("dene_test", "Без серий")
+
+
+def test_thumbnail_metrics_register_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    monkeypatch.setattr(image_cache, "_requests_counter", None)
+    # Импорт модуля (как во Flask через catalog_api) ничего не регистрирует
+    assert "dene_thumbnail" not in metrics.REGISTRY.expose()
+
+    image_path = str(tmp_path / "shoe.jpg")
+    Image.new('RGB', (300, 200), (200, 30, 30)).save(image_path)
+    cache = ThumbnailCache(cache_dir=str(tmp_path / "thumbnails"))
+    cache.get_base64(image_path, (100, 100))
+    cache.get_base64(image_path, (100, 100))
+
+    text = metrics.REGISTRY.expose()
+    assert 'dene_thumbnail_cache_requests_total{result="render"} 1' in text
+    assert 'dene_thumbnail_cache_requests_total{result="memory_hit"} 1' in text
+    assert "dene_thumbnail_cache_memory_entries" in text
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from components import order_queue
+from components.order_queue import FAILED, PENDING, SENT, OrderDispatcher, OrderQueue, TelegramSender
+
+
+class StubTelegram:
+    """Локальный HTTP сервер вместо api.telegram.org: отвечает по списку (код, тело)"""
+
+    def __init__(self, responses=(), default=(200, {"ok": True})):
+        self.responses = list(responses)
+        self.default = default
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.requests.append((self.path, body))
+                status, payload = stub.responses.pop(0) if stub.responses else stub.default
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = StubTelegram()
+    monkeypatch.setattr(order_queue, "TELEGRAM_API_URL", server.url)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return OrderQueue(str(tmp_path / "outbox.db"))
+
+
+def _order(**item):
+    return {
+        'customer_name': 'Тест',
+        'customer_phone': '+7 700 000 00 00',
+        'customer_address': '-',
+        'items': [dict({'brand': 'Nike', 'model': 'Air Force 1', 'color': 'white', 'size': '42',
+                        'price': 72000}, **item)],
+    }
+
+
+def _dispatcher(queue):
+    return OrderDispatcher(queue, TelegramSender("TOKEN", "CHAT", timeout=(1, 1)))
+
+
+def _row(queue, order_id):
+    return queue._connect().execute(
+        "SELECT status, attempts, next_attempt FROM outbox WHERE order_id = ?", (order_id,)
+    ).fetchone()
+
+
+def test_sends_item_without_quantity(stub, queue):
+    dispatcher = _dispatcher(queue)
+    order_id = queue.enqueue(_order())
+
+    assert dispatcher.run_once() == 1
+    assert queue.status(order_id) == SENT
+    path, body = stub.requests[0]
+    assert path == "/botTOKEN/sendMessage"
+    assert order_id in body['text']
+    assert "72,000 ₸ x 1" in body['text']
+
+
+def test_retries_after_server_error(stub, queue, monkeypatch):
+    monkeypatch.setattr(order_queue, "backoff_delay", lambda attempts: 0)
+    stub.responses = [(500, {"ok": False})]
+    dispatcher = _dispatcher(queue)
+    order_id = queue.enqueue(_order(quantity=2))
+
+    assert dispatcher.run_once() == 0
+    assert (_row(queue, order_id)['status'], _row(queue, order_id)['attempts']) == (PENDING, 1)
+
+    assert dispatcher.run_once() == 1
+    assert queue.status(order_id) == SENT
+    assert len(stub.requests) == 2
+
+
+def test_honours_retry_after(stub, queue):
+    stub.responses = [(429, {"ok": False, "parameters": {"retry_after": 30}})]
+    dispatcher = _dispatcher(queue)
+    order_id = queue.enqueue(_order())
+
+    before = time.time()
+    assert dispatcher.run_once() == 0
+    row = _row(queue, order_id)
+    assert row['status'] == PENDING
+    assert before + 29 <= row['next_attempt'] <= time.time() + 30
+
+    # До конца retry_after заказ не забирается повторно
+    assert dispatcher.run_once() == 0
+    assert len(stub.requests) == 1
+
+
+def test_fails_after_max_attempts(stub, queue, monkeypatch):
+    monkeypatch.setattr(order_queue, "backoff_delay", lambda attempts: 0)
+    monkeypatch.setattr(order_queue, "MAX_ATTEMPTS", 3)
+    stub.default = (502, {"ok": False})
+    dispatcher = _dispatcher(queue)
+    order_id = queue.enqueue(_order())
+
+    for _ in range(5):
+        dispatcher.run_once()
+
+    assert queue.status(order_id) == FAILED
+    assert _row(queue, order_id)['attempts'] == 3
+    assert len(stub.requests) == 3
+
+
+def test_broken_order_does_not_stop_dispatcher(stub, queue):
+    dispatcher = _dispatcher(queue)
+    dispatcher.idle_interval = 0.05
+    dispatcher.start()
+    try:
+        broken_id = dispatcher.submit({'items': []})  # без данных покупателя
+        order_id = dispatcher.submit(_order())
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and PENDING in (queue.status(order_id), queue.status(broken_id)):
+            time.sleep(0.02)
+        assert dispatcher._thread.is_alive()
+    finally:
+        dispatcher.stop()
+
+    assert queue.status(broken_id) == FAILED
+    assert queue.status(order_id) == SENT
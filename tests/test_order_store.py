@@ -0,0 +1,40 @@
+import time
+
+from components.order_store import OrderStore, OrderWriter
+
+
+def _order(phone="+7 700 000 00 01"):
+    return {
+        'customer_name': 'Тест',
+        'customer_phone': phone,
+        'customer_address': '-',
+        'items': [{'brand': 'Nike', 'model': 'Air Force 1', 'color': 'white', 'size': '42', 'price': 72000}],
+    }
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_writer_survives_bad_batch(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    writer = OrderWriter(store, batch_size=1, flush_interval=0.01).start()
+
+    # Товар не словарь: add_many падает с AttributeError, а не sqlite3.Error
+    bad = _order()
+    bad['items'] = ["Nike Air Force 1"]
+    writer.submit("BAD-1", bad)
+    assert _wait(lambda: writer.last_error is not None)
+
+    writer.submit("GOOD-1", _order())
+    assert _wait(lambda: store.get("GOOD-1") is not None)
+    assert writer._thread.is_alive()
+    writer.stop()
+
+    assert store.get("BAD-1") is None
+    assert store.get("GOOD-1")['items'][0]['quantity'] == 1